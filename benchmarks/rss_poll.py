@@ -0,0 +1,448 @@
+#   Copyright 2017-present Michael Hall
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Benchmarks the RSS poll pipeline, from fetching feeds through to sending.
+
+A stand-in server, in its own process, serves synthetic RSS and Atom feeds
+of varying sizes and update patterns. The cog is then run through
+poll cycles against a fake bot which accepts every message sent.
+
+Run from the root of the repository, with the cog's requirements installed::
+
+    python -m benchmarks.rss_poll --feeds 500 --cycles 20
+
+Every feed is polled each cycle, as if enough time had passed
+for all of them to be due, and the short lived cache of responses
+is cleared between cycles so that each one fetches from the server.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import email.utils
+import html
+import json
+import math
+import multiprocessing
+import socket
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, DefaultDict, Dict, List, NamedTuple, Optional, Tuple
+
+import discord
+from aiohttp import web
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore
+
+PATTERNS = (
+    "static",  # never changes, and can be answered with a 304
+    "growing",  # a new entry each time it's fetched
+    "unvalidated",  # never changes, but doesn't send validators
+    "burst",  # many new entries every 5th fetch
+)
+SIZES = (10, 50, 250)
+BASE_TIME = 1_600_000_000
+ENTRY_SPACING = 600
+
+
+class FeedSpec(NamedTuple):
+    number: int
+    pattern: str
+    size: int
+    kind: str
+
+    @property
+    def path(self) -> str:
+        return f"/feeds/{self.number}"
+
+
+def make_corpus(count: int) -> List[FeedSpec]:
+    return [
+        FeedSpec(
+            number=i,
+            pattern=PATTERNS[i % len(PATTERNS)],
+            size=SIZES[(i // len(PATTERNS)) % len(SIZES)],
+            kind="atom" if (i // (len(PATTERNS) * len(SIZES))) % 2 else "rss",
+        )
+        for i in range(count)
+    ]
+
+
+def feed_version(spec: FeedSpec, fetches: int) -> int:
+    """
+    How many entries have been added to the feed.
+    """
+    if spec.pattern == "growing":
+        return fetches
+    if spec.pattern == "burst":
+        return (fetches // 5) * 20
+    return 0
+
+
+def render_feed(spec: FeedSpec, version: int) -> bytes:
+    newest = spec.size + version
+    parts: List[str] = []
+    if spec.kind == "atom":
+        updated = datetime.fromtimestamp(
+            BASE_TIME + newest * ENTRY_SPACING, timezone.utc
+        ).isoformat()
+        parts.append(
+            '<?xml version="1.0" encoding="utf-8"?>'
+            '<feed xmlns="http://www.w3.org/2005/Atom">'
+            f"<title>Feed {spec.number}</title>"
+            f'<link href="https://example.com/{spec.number}/"/>'
+            f"<id>urn:bench:{spec.number}</id><updated>{updated}</updated>"
+        )
+    else:
+        parts.append(
+            '<?xml version="1.0" encoding="utf-8"?><rss version="2.0"><channel>'
+            f"<title>Feed {spec.number}</title>"
+            f"<link>https://example.com/{spec.number}/</link>"
+            f"<description>Synthetic feed {spec.number}</description>"
+        )
+
+    for n in range(newest - 1, newest - 1 - spec.size, -1):
+        when = BASE_TIME + n * ENTRY_SPACING
+        link = f"https://example.com/{spec.number}/{n}"
+        summary = html.escape(
+            "<p>" + "Lorem ipsum <b>dolor</b> sit amet. " * (1 + n % 40) + "</p>"
+        )
+        if spec.kind == "atom":
+            stamp = datetime.fromtimestamp(when, timezone.utc).isoformat()
+            parts.append(
+                f"<entry><title>Entry {n} of feed {spec.number}</title>"
+                f'<link href="{link}"/><id>{link}</id>'
+                f"<published>{stamp}</published><updated>{stamp}</updated>"
+                f'<summary type="html">{summary}</summary></entry>'
+            )
+        else:
+            stamp = email.utils.formatdate(when, usegmt=True)
+            parts.append(
+                f"<item><title>Entry {n} of feed {spec.number}</title>"
+                f"<link>{link}</link><guid>{link}</guid>"
+                f"<pubDate>{stamp}</pubDate>"
+                f"<description>{summary}</description></item>"
+            )
+
+    parts.append("</feed>" if spec.kind == "atom" else "</channel></rss>")
+    return "".join(parts).encode("utf-8")
+
+
+def run_server(conn, corpus_size: int):
+    """
+    Serves the corpus, sending the port listened on back through conn.
+    """
+    corpus = make_corpus(corpus_size)
+    fetches = [0] * corpus_size
+    # number -> (version, body), only the latest body of each feed is kept
+    bodies: Dict[int, Tuple[int, bytes]] = {}
+
+    async def handle(request: web.Request) -> web.Response:
+        try:
+            spec = corpus[int(request.match_info["number"])]
+        except (ValueError, IndexError):
+            raise web.HTTPNotFound()
+
+        version = feed_version(spec, fetches[spec.number])
+        etag = f'"{spec.number}-{version}"'
+        validated = spec.pattern != "unvalidated"
+        if validated and request.headers.get("If-None-Match", None) == etag:
+            return web.Response(status=304)
+
+        fetches[spec.number] += 1
+        cached = bodies.get(spec.number, None)
+        if cached and cached[0] == version:
+            body = cached[1]
+        else:
+            body = render_feed(spec, version)
+            bodies[spec.number] = (version, body)
+
+        content_type = "application/atom+xml" if spec.kind == "atom" else "text/xml"
+        headers = {"Content-Type": content_type}
+        if validated:
+            headers["ETag"] = etag
+        return web.Response(body=body, headers=headers)
+
+    async def serve():
+        app = web.Application()
+        app.router.add_get("/feeds/{number}", handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        await web.SockSite(runner, sock).start()
+        conn.send(sock.getsockname()[1])
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.me = SimpleNamespace(color=discord.Color.default())
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int, guild: FakeGuild):
+        self.id = channel_id
+        self.guild = guild
+
+
+class FakeHTTP:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.sent = 0
+
+    async def request(self, route, **kwargs) -> Dict[str, Any]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent += 1
+        return {}
+
+
+class FakeBot:
+    """
+    Just enough of a bot for the poll loop.
+    """
+
+    def __init__(self, channels: List[FakeChannel], send_latency: float):
+        self.http = FakeHTTP(send_latency)
+        self._channels = {c.id: c for c in channels}
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        return self._channels.get(channel_id, None)
+
+    async def embed_requested(self, channel: FakeChannel, member) -> bool:
+        return channel.guild.id % 2 == 0
+
+    def dispatch(self, event_name: str, *args, **kwargs):
+        pass
+
+
+class Clock:
+    """
+    Stands in for time.time in the poll scheduler, so cycles can skip ahead.
+    """
+
+    def __init__(self):
+        self.offset = 0.0
+
+    def time(self) -> float:
+        return time.time() + self.offset
+
+    def advance(self, seconds: float):
+        self.offset += seconds
+
+
+def configure_red(data_path: Path):
+    """
+    Points Red's data manager at a scratch directory using JSON storage,
+    the same way Red's own test fixtures do.
+    """
+    from redbot.core import data_manager
+
+    data_manager.basic_config = {
+        **data_manager.basic_config_default,
+        "DATA_PATH": str(data_path),
+        "STORAGE_TYPE": "JSON",
+        "STORAGE_DETAILS": {},
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+
+def peak_rss_mib() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+async def benchmark(args: argparse.Namespace, port: int) -> Dict[str, Any]:
+    from rss import polling
+    from rss.core import RSS
+    from rss.seen import merge_seen
+
+    clock = Clock()
+    polling.time = SimpleNamespace(time=clock.time)  # type: ignore
+
+    guilds = [FakeGuild(g) for g in range(max(args.channels // 5, 1))]
+    channels = [
+        FakeChannel(1000 + c, guilds[c % len(guilds)]) for c in range(args.channels)
+    ]
+    bot = FakeBot(channels, args.send_latency / 1000)
+    corpus = make_corpus(args.feeds)
+
+    cog = RSS(bot)
+    try:
+        await cog.config.parser_executor.set(args.executor)
+        await cog.config.streaming_parse.set(args.streaming)
+
+        by_channel: DefaultDict[int, Dict[str, dict]] = defaultdict(dict)
+        for spec in corpus:
+            url = f"http://127.0.0.1:{port}{spec.path}"
+            response = await cog.fetch_feed(url)
+            if response is None:
+                raise RuntimeError(f"The stand-in server didn't serve {url}")
+            for k in range(args.subscriptions):
+                channel = channels[(spec.number + k * 7) % len(channels)]
+                by_channel[channel.id][f"feed-{spec.number}"] = {
+                    "url": url,
+                    "template": None,
+                    "embed_override": None,
+                    "last": list(time.gmtime()[:6]),
+                    "seen": merge_seen([], response["entry_keys"]),
+                }
+        for channel_id, feeds in by_channel.items():
+            await cog.config.channel_from_id(channel_id).feeds.set(feeds)
+
+        await cog.load_state()
+
+        if args.tracemalloc:
+            tracemalloc.start()
+
+        durations: List[float] = []
+        cycles: List[Any] = []
+        for _ in range(args.cycles):
+            clock.advance(polling.MAX_INTERVAL * 2)
+            cog._response_cache.clear()
+            start = time.perf_counter()
+            await cog.do_feeds()
+            while cog._send_queue.depths():
+                await asyncio.sleep(0.001)
+            durations.append(time.perf_counter() - start)
+            # Each cycle gets its own window of metrics
+            if metrics := await cog.finish_metrics_window():
+                cycles.append(metrics)
+
+        traced_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    finally:
+        cog.cog_unload()
+        await cog.session.close()
+
+    feeds_polled = sum(c.feeds_due for c in cycles)
+
+    def per_cycle(attr: str) -> float:
+        return statistics.mean(getattr(c, attr) for c in cycles) if cycles else 0.0
+
+    return {
+        "feeds": args.feeds,
+        "subscriptions": args.feeds * args.subscriptions,
+        "cycles": args.cycles,
+        "executor": args.executor,
+        "streaming": args.streaming,
+        "cycle_seconds": {
+            "mean": statistics.mean(durations),
+            "p50": percentile(durations, 0.5),
+            "p99": percentile(durations, 0.99),
+            "max": max(durations),
+        },
+        "feeds_per_second": feeds_polled / sum(durations),
+        "per_cycle": {
+            "fetched": per_cycle("fetched"),
+            "unmodified": per_cycle("unmodified"),
+            "failures": per_cycle("failures"),
+            "bytes_downloaded": per_cycle("bytes_downloaded"),
+            "parse_seconds": per_cycle("parse_seconds"),
+            "entries_queued": per_cycle("entries_queued"),
+        },
+        "messages_sent": bot.http.sent,
+        "peak_rss_mib": peak_rss_mib(),
+        "peak_traced_mib": traced_peak / (1024 * 1024) if traced_peak else None,
+    }
+
+
+def report(results: Dict[str, Any]) -> str:
+    cycle = results["cycle_seconds"]
+    per = results["per_cycle"]
+    lines = [
+        f"{results['feeds']} feeds, {results['subscriptions']} subscriptions, "
+        f"{results['cycles']} cycles ({results['executor']} pool"
+        f"{', streaming' if results['streaming'] else ''})",
+        f"Cycle time: mean {cycle['mean']:.3f}s, p50 {cycle['p50']:.3f}s, "
+        f"p99 {cycle['p99']:.3f}s, max {cycle['max']:.3f}s",
+        f"Throughput: {results['feeds_per_second']:.1f} feeds/s",
+        f"Per cycle: {per['fetched']:.0f} fetched, {per['unmodified']:.0f} unmodified, "
+        f"{per['failures']:.0f} failed, {per['bytes_downloaded'] / 1024:.0f} KiB, "
+        f"{per['parse_seconds']:.3f}s parsing, {per['entries_queued']:.0f} queued",
+        f"Messages sent: {results['messages_sent']}",
+    ]
+    if (rss := results["peak_rss_mib"]) is not None:
+        lines.append(f"Peak RSS: {rss:.1f} MiB")
+    if (traced := results["peak_traced_mib"]) is not None:
+        lines.append(f"Peak traced allocations during cycles: {traced:.1f} MiB")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--feeds", type=int, default=200)
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument(
+        "--subscriptions", type=int, default=2, help="Channels subscribed to each feed"
+    )
+    parser.add_argument("--cycles", type=int, default=10)
+    parser.add_argument("--executor", choices=("thread", "process"), default="thread")
+    parser.add_argument("--streaming", action="store_true")
+    parser.add_argument(
+        "--send-latency",
+        type=float,
+        default=0.0,
+        help="Milliseconds the fake bot takes to send each message",
+    )
+    parser.add_argument(
+        "--tracemalloc",
+        action="store_true",
+        help="Trace allocations, this slows everything down",
+    )
+    parser.add_argument("--json", type=Path, help="Also write the results here")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe()
+    server = ctx.Process(target=run_server, args=(child_conn, args.feeds), daemon=True)
+    server.start()
+    try:
+        port = parent_conn.recv()
+        with tempfile.TemporaryDirectory() as tmp:
+            configure_red(Path(tmp))
+            results = asyncio.run(benchmark(args, port))
+    finally:
+        server.terminate()
+        server.join()
+
+    print(report(results))
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
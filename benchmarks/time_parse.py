@@ -0,0 +1,144 @@
+#   Copyright 2017-present Michael Hall
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Benchmarks parsing times the way scheduler and embedmaker do.
+
+Each parse is timed both with a freshly built table of timezone abbreviations,
+as every parse used to do, and with the shared table parse_time now uses.
+
+Run from the root of the repository, with pytz and python-dateutil installed::
+
+    python -m benchmarks.time_parse --iterations 200
+
+The cog's time_utils is loaded on its own,
+so this doesn't need the rest of the cog's requirements.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Dict, List
+
+from dateutil import parser as date_parser
+
+COGS = ("scheduler", "embedmaker")
+
+SAMPLES = (
+    "February 14 at 6pm EDT",
+    "12AM",
+    "2030-06-01 13:45 PST",
+    "March 3 2031 9:15am CET",
+    "7pm",
+    "December 31 at 11:59pm UTC",
+)
+
+
+def load_time_utils(cog: str) -> ModuleType:
+    path = Path(__file__).resolve().parent.parent / cog / "time_utils.py"
+    spec = importlib.util.spec_from_file_location(f"{cog}_time_utils", path)
+    assert spec is not None and spec.loader is not None, "mypy"  # nosec
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def time_per_call(func: Callable[[str], Any], iterations: int) -> List[float]:
+    """
+    Seconds taken by each call, parsing each sample in turn.
+    """
+    timings: List[float] = []
+    for i in range(iterations):
+        sample = SAMPLES[i % len(SAMPLES)]
+        start = time.perf_counter()
+        func(sample)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    ordered = sorted(timings)
+    return {
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "median_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000,
+    }
+
+
+def benchmark(cog: str, iterations: int) -> Dict[str, Any]:
+    time_utils = load_time_utils(cog)
+
+    def uncached(datetimestring: str):
+        tzinfos = dict(time_utils.gen_tzinfos())
+        return date_parser.parse(datetimestring, tzinfos=tzinfos)
+
+    start = time.perf_counter()
+    table = time_utils.get_tzinfos()
+    build_ms = (time.perf_counter() - start) * 1000
+
+    before = summarize(time_per_call(uncached, iterations))
+    after = summarize(time_per_call(time_utils.parse_time, iterations))
+    return {
+        "cog": cog,
+        "iterations": iterations,
+        "zones": len(table),
+        "table_build_ms": build_ms,
+        "before": before,
+        "after": after,
+        "speedup": before["mean_ms"] / after["mean_ms"],
+    }
+
+
+def report(result: Dict[str, Any]):
+    print(
+        f"{result['cog']}: {result['iterations']} parses, "
+        f"{result['zones']} abbreviations, "
+        f"table built in {result['table_build_ms']:.2f}ms"
+    )
+    for label in ("before", "after"):
+        stats = result[label]
+        print(
+            f"    {label:<7} mean {stats['mean_ms']:.3f}ms"
+            f"  median {stats['median_ms']:.3f}ms"
+            f"  p95 {stats['p95_ms']:.3f}ms"
+        )
+    print(f"    {result['speedup']:.1f}x faster per parse")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--cog", choices=COGS, action="append")
+    parser.add_argument("--json", type=Path, help="Also write the results here")
+    args = parser.parse_args()
+
+    results = [benchmark(cog, args.iterations) for cog in args.cog or COGS]
+    for result in results:
+        report(result)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,9 +15,10 @@
 from __future__ import annotations
 
 import re
+import time
 from datetime import datetime as dt
-from datetime import timedelta
-from typing import Optional
+from datetime import timedelta, tzinfo
+from typing import Dict, Optional
 
 import pytz
 from dateutil import parser
@@ -35,6 +36,13 @@ TIME_RE_STRING = r"\s?".join(
 
 TIME_RE = re.compile(TIME_RE_STRING, re.I)
 
+# Which abbreviation a zone uses changes with DST,
+# so the table of them is rebuilt once it's this many seconds old.
+TZINFOS_TTL = 3600
+
+_tzinfos: Dict[str, tzinfo] = {}
+_tzinfos_built_at: Optional[float] = None
+
 
 def gen_tzinfos():
     for zone in pytz.common_timezones:
@@ -49,8 +57,21 @@ def gen_tzinfos():
                 yield tzdate.tzname(), tzinfo
 
 
+def get_tzinfos() -> Dict[str, tzinfo]:
+    """
+    Gets the current timezone abbreviations, building them at most once an hour.
+    """
+    global _tzinfos, _tzinfos_built_at
+
+    now = time.monotonic()
+    if _tzinfos_built_at is None or now - _tzinfos_built_at >= TZINFOS_TTL:
+        _tzinfos = dict(gen_tzinfos())
+        _tzinfos_built_at = now
+    return _tzinfos
+
+
 def parse_time(datetimestring: str):
-    ret = parser.parse(datetimestring, tzinfos=dict(gen_tzinfos()))
+    ret = parser.parse(datetimestring, tzinfos=get_tzinfos())
     ret = ret.astimezone(pytz.utc)
     return ret
 
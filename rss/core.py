@@ -15,59 +15,99 @@
 from __future__ import annotations
 
 import asyncio
+import io
 import logging
-import string
+import time
 import urllib.parse
+from collections import defaultdict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 from functools import partial
 from types import MappingProxyType
-from typing import Any, Dict, Generator, List, Optional, cast
+from typing import (
+    Any,
+    Callable,
+    DefaultDict,
+    Deque,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    cast,
+)
 
 import aiohttp
 import discord
 import feedparser
-from bs4 import BeautifulSoup as bs4
 from redbot.core import checks, commands
 from redbot.core.config import Config
-from redbot.core.utils.chat_formatting import box, pagify
+from redbot.core.data_manager import cog_data_path
+from redbot.core.utils.chat_formatting import box, humanize_timedelta, pagify
 
-from .cleanup import html_to_text
+from .cache import TTLCache
 from .converters import FieldAndTerm, NonEveryoneRole, TriState
+from .filters import (
+    MAX_RULES,
+    MODES,
+    EntryText,
+    compile_filters,
+    entry_texts,
+    validate_rule,
+)
+from .index import SubscriptionIndex
+from .metrics import METRICS_WINDOW, PollMetrics, write_dump
+from .opml import OPMLFeed, build_opml, parse_opml
+from .parsing import (
+    DEFAULT_EMBED_TEMPLATE,
+    DEFAULT_TEMPLATE,
+    USABLE_TEXT_FIELDS,
+    find_feed_links,
+    parse_feed,
+    render_entries,
+    render_entry,
+)
+from .polling import PollScheduler, parse_max_age
+from .seen import merge_seen
+from .sending import ChannelSendQueue
+from .streaming import EarlyStop
 
 log = logging.getLogger("red.sinbadcogs.rss")
 
-DONT_HTML_SCRUB = ["link", "source", "updated", "updated_parsed"]
-
-USABLE_FIELDS = [
-    "author",
-    "author_detail",
-    "description",
-    "comments",
-    "content",
-    "contributors",
-    "created",
-    "updated",
-    "updated_parsed",
-    "link",
-    "name",
-    "published",
-    "published_parsed",
-    "publisher",
-    "publisher_detail",
-    "source",
-    "summary",
-    "summary_detail",
-    "tags",
-    "title",
-    "title_detail",
-]
-
-USABLE_TEXT_FIELDS = [
-    f
-    for f in USABLE_FIELDS
-    if f
-    not in ("published", "published_parsed", "updated", "updated_parsed", "created",)
-]
+READ_CHUNK_SIZE = 64 * 1024
+# Feeds which come due are polled together at most this often,
+# as each poll ends with writing what changed to config.
+POLL_TICK = 30
+MAX_OPML_SIZE = 5 * 1024 * 1024
+# Feeds being imported are validated in batches of this size
+IMPORT_BATCH_SIZE = 200
+# How many feeds can be imported at once by anyone other than the bot owner
+MAX_IMPORT_FEEDS = 50
+
+T = TypeVar("T")
+
+# The result of parsing.parse_feed
+ParsedFeed = Dict[str, Any]
+
+
+def to_feedparser(value: Any, key: str = "") -> Any:
+    """
+    Rebuilds what feedparser provides from the plain data parse_feed returns,
+    for listeners which expect feedparser's types.
+    """
+    if isinstance(value, dict):
+        return feedparser.FeedParserDict(
+            {k: to_feedparser(v, k) for k, v in value.items()}
+        )
+    if isinstance(value, (list, tuple)):
+        if key.endswith("_parsed") and len(value) == 9:
+            return time.struct_time(value)
+        return [to_feedparser(v) for v in value]
+    return value
 
 
 def debug_exc_log(lg: logging.Logger, exc: Exception, msg: str = "Exception in RSS"):
@@ -98,8 +138,44 @@ class RSS(commands.Cog):
             self, identifier=78631113035100160, force_registration=True
         )
         self.config.register_channel(feeds={})
-        self.session = aiohttp.ClientSession()
+        self.config.register_global(
+            max_concurrent_fetches=50,
+            max_fetches_per_host=4,
+            http_validators={},
+            parser_executor="thread",
+            parser_workers=None,
+            pending_feed_updates={},
+            feed_failures={},
+            dns_cache_ttl=300,
+            keepalive_timeout=30,
+            http_compression=True,
+            streaming_parse=False,
+            max_body_size=10 * 1024 * 1024,
+        )
+        self.session = self.make_session()
         self.bg_loop_task: Optional[asyncio.Task] = None
+        # url -> {"etag": ..., "last_modified": ...} for conditional requests
+        self._http_validators: Dict[str, Dict[str, str]] = {}
+        self._validators_dirty = False
+        self._saved_failures: Dict[str, Dict[str, float]] = {}
+        self._executor: Executor = ThreadPoolExecutor(thread_name_prefix="rss")
+        self._poller = PollScheduler()
+        self._index = SubscriptionIndex()
+        self._send_queue = ChannelSendQueue()
+        self._discovery_cache: TTLCache[str, List[str]] = TTLCache(
+            maxsize=256, ttl=3600
+        )
+        # Shared by every path which fetches feeds, these must not be mutated.
+        self._response_cache: TTLCache[str, ParsedFeed] = TTLCache(maxsize=512, ttl=60)
+        self._streaming_parse = False
+        self._max_body_size = 10 * 1024 * 1024
+        self._metrics: Optional[PollMetrics] = None
+        # The last hour of finished windows
+        self._metrics_history: Deque[PollMetrics] = deque(maxlen=12)
+        # channel id -> feed name -> values to write at the end of a poll cycle
+        self._pending_updates: DefaultDict[str, Dict[str, dict]] = defaultdict(dict)
+        # (channel id, feed name) of subscriptions with entries still being sent
+        self._sending: Set[Tuple[int, str]] = set()
 
     def init(self):
         self.bg_loop_task = asyncio.create_task(self.bg_loop())
@@ -122,18 +198,144 @@ class RSS(commands.Cog):
     def cog_unload(self):
         if self.bg_loop_task:
             self.bg_loop_task.cancel()
+        self._send_queue.cancel_all()
         asyncio.create_task(self.session.close())
+        self._executor.shutdown(wait=False)
+
+    @staticmethod
+    def make_session(
+        *,
+        limit: int = 50,
+        limit_per_host: int = 4,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: int = 30,
+        compression: bool = True,
+    ) -> aiohttp.ClientSession:
+        """
+        Many feeds tend to be on a few hosts,
+        so connections are kept open for reuse and DNS lookups are cached.
+        """
+        if keepalive_timeout:
+            keepalive: Dict[str, Any] = {"keepalive_timeout": keepalive_timeout}
+        else:
+            keepalive = {"force_close": True}
+        connector = aiohttp.TCPConnector(
+            limit=limit,
+            limit_per_host=limit_per_host,
+            use_dns_cache=dns_cache_ttl > 0,
+            ttl_dns_cache=dns_cache_ttl or None,
+            enable_cleanup_closed=True,
+            **keepalive,
+        )
+        headers = {"Accept-Encoding": "gzip, deflate" if compression else "identity"}
+        return aiohttp.ClientSession(connector=connector, headers=headers)
+
+    async def refresh_session(self):
+        """
+        Replaces the session with one using the current settings.
+        """
+        old = self.session
+        self.session = self.make_session(
+            limit=await self.config.max_concurrent_fetches(),
+            limit_per_host=await self.config.max_fetches_per_host(),
+            dns_cache_ttl=await self.config.dns_cache_ttl(),
+            keepalive_timeout=await self.config.keepalive_timeout(),
+            compression=await self.config.http_compression(),
+        )
+
+        async def close_later():
+            # Anything still using the old session times out by then.
+            await asyncio.sleep(20)
+            await old.close()
+
+        asyncio.create_task(close_later())
+
+    def set_executor(self, kind: str, workers: Optional[int] = None):
+        """
+        Replaces the pool used for parsing and formatting feeds.
+
+        Process pools keep the work entirely off of the bot's process,
+        at the cost of copying data to and from the workers.
+        """
+        old = self._executor
+        if kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="rss"
+            )
+        old.shutdown(wait=False)
+
+    async def run_in_pool(self, func: Callable[..., T], *args) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args))
 
     async def should_embed(self, channel: discord.TextChannel) -> bool:
         ret: bool = await self.bot.embed_requested(channel, channel.guild.me)
         return ret
 
-    async def fetch_feed(self, url: str) -> Optional[feedparser.FeedParserDict]:
-        timeout = aiohttp.client.ClientTimeout(total=15)
+    async def fetch_feed(
+        self, url: str, *, conditional: bool = False
+    ) -> Optional[ParsedFeed]:
+        """
+        Fetches and parses a feed.
+
+        Conditional fetches are those made by the poll loop.
+        They send the validators from the last one to succeed,
+        treat a feed which hasn't been modified as having no response,
+        and schedule when the feed is next polled.
+
+        Successful responses which were read in full are briefly cached,
+        so the same feed being added to many channels is only fetched once.
+
+        Responses which were only partly read have "partial" set,
+        as they may leave out entries which are still in the feed.
+        """
+        if (cached := self._response_cache.get(url)) is not None:
+            if conditional:
+                self._poller.record_response(url, cached)
+            return cached
+
+        # Feeds which are down are given less time to prove otherwise.
+        probing = conditional and self._poller.circuit_open(url)
+        timeout = aiohttp.client.ClientTimeout(total=5 if probing else 15)
+        headers = {}
+        if conditional and (validators := self._http_validators.get(url, None)):
+            if etag := validators.get("etag", None):
+                headers["If-None-Match"] = etag
+            if last_modified := validators.get("last_modified", None):
+                headers["If-Modified-Since"] = last_modified
+
+        metrics = self._metrics if conditional else None
+        started = time.perf_counter()
+
         try:
-            async with self.session.get(url, timeout=timeout) as response:
-                data = await response.read()
+            async with self.session.get(
+                url, timeout=timeout, headers=headers
+            ) as response:
+                max_age = parse_max_age(response.headers.get("Cache-Control", None))
+                if response.status == 304:
+                    log.debug(f"Feed url: {url} is unmodified.")
+                    if conditional:
+                        self._poller.record_unmodified(url, max_age=max_age)
+                    if metrics:
+                        metrics.unmodified += 1
+                        metrics.record_fetch(url, time.perf_counter() - started)
+                    return None
+                marker = self._poller.read_marker(url) if conditional else None
+                data, complete = await self.read_body(response, marker)
+                if metrics:
+                    metrics.record_fetch(url, time.perf_counter() - started)
+                if data is None:
+                    log.debug(f"Feed url: {url} is larger than allowed.")
+                    if conditional:
+                        self.record_poll_failure(url)
+                    return None
+                etag = response.headers.get("ETag", None)
+                last_modified = response.headers.get("Last-Modified", None)
         except (aiohttp.ClientError, asyncio.TimeoutError):
+            if conditional:
+                self.record_poll_failure(url, time.perf_counter() - started)
             return None
         except Exception as exc:
             debug_exc_log(
@@ -141,9 +343,18 @@ class RSS(commands.Cog):
                 exc,
                 f"Unexpected exception type {type(exc)} encountered for feed url: {url}",
             )
+            if conditional:
+                self.record_poll_failure(url, time.perf_counter() - started)
             return None
 
-        ret = feedparser.parse(data)
+        parse_started = time.perf_counter()
+        ret = await self.run_in_pool(parse_feed, data)
+        if not complete:
+            ret["partial"] = True
+        if metrics:
+            metrics.fetched += 1
+            metrics.bytes_downloaded += len(data)
+            metrics.parse_seconds += time.perf_counter() - parse_started
         self.bot.dispatch(
             # dispatch is versioned.
             # To remain compatible, accept kwargs and check version
@@ -162,13 +373,121 @@ class RSS(commands.Cog):
             "sinbadcogs_rss_fetch",
             listener_version=1,
             response_regenerator=partial(feedparser.parse, data),
-            bozo=ret.bozo,
+            bozo=ret["bozo"],
         )
-        if ret.bozo:
+        if ret["bozo"]:
             log.debug(f"Feed url: {url} is invalid.")
+            if conditional:
+                self.record_poll_failure(url)
             return None
+
+        if conditional:
+            self._poller.record_response(url, ret, max_age=max_age)
+            # Only the poll loop handles every entry of what it fetches.
+            # Validators from other fetches would have it skip entries
+            # published since it last polled.
+            self.update_validators(url, etag=etag, last_modified=last_modified)
+        # Other uses of the cache, such as marking entries as seen for a new
+        # subscription, need every entry.
+        if complete:
+            self._response_cache.set(url, ret)
+
         return ret
 
+    def record_poll_failure(self, url: str, latency: Optional[float] = None):
+        self._poller.record_failure(url)
+        if metrics := self._metrics:
+            metrics.failures += 1
+            if latency is not None:
+                metrics.record_fetch(url, latency)
+
+    async def read_body(
+        self, response: aiohttp.ClientResponse, marker: Optional[float] = None
+    ) -> Tuple[Optional[bytes], bool]:
+        """
+        Reads a response body, and if all of it was read.
+        The body is None if it's over the maximum size.
+
+        With streaming enabled, reading stops early once the feed is past
+        entries no newer than the marker, and oversized feeds are cut
+        to the entries which fit rather than discarded.
+        """
+        if not self._streaming_parse:
+            data = bytearray()
+            async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                data.extend(chunk)
+                if len(data) > self._max_body_size:
+                    return None, False
+            return bytes(data), True
+
+        stopper = EarlyStop(marker)
+        async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+            if stopper.feed(chunk):
+                return stopper.body(), False
+            if len(stopper) > self._max_body_size:
+                return stopper.body(truncate=True), False
+        return stopper.body(), True
+
+    def update_validators(
+        self, url: str, *, etag: Optional[str], last_modified: Optional[str]
+    ):
+        validators = {}
+        if etag:
+            validators["etag"] = etag
+        if last_modified:
+            validators["last_modified"] = last_modified
+
+        if self._http_validators.get(url, {}) != validators:
+            self._validators_dirty = True
+            if validators:
+                self._http_validators[url] = validators
+            else:
+                self._http_validators.pop(url, None)
+
+    async def save_validators(self, active_urls: Optional[Iterable[str]] = None):
+        """
+        Persists the validators used for conditional requests.
+
+        If provided active urls, validators for any other url are discarded.
+        """
+        if active_urls is not None:
+            active = set(active_urls)
+            for url in [u for u in self._http_validators if u not in active]:
+                del self._http_validators[url]
+                self._validators_dirty = True
+
+        if self._validators_dirty:
+            self._validators_dirty = False
+            await self.config.http_validators.set(self._http_validators)
+
+    async def save_failures(self):
+        """
+        Persists which feeds are failing, so that backoff survives reloads.
+        """
+        snapshot = self._poller.failure_snapshot()
+        if snapshot != self._saved_failures:
+            self._saved_failures = snapshot
+            await self.config.feed_failures.set(snapshot)
+
+    def poll_status(self, url: Optional[str]) -> str:
+        """
+        A short description of when a feed is next checked, for display.
+        """
+        if url and (when := self._poller.next_poll(url)) is not None:
+            delay = int(when - time.time())
+            if delay > 0:
+                status = f"next check in {humanize_timedelta(seconds=delay)}"
+            else:
+                status = "next check due now"
+            if failures := self._poller.failures(url):
+                if self._poller.circuit_open(url):
+                    prefix = f"appears to be down ({failures} failures in a row)"
+                else:
+                    prefix = f"failed {failures} time{'s' if failures > 1 else ''}"
+                status = f"{prefix}, {status}"
+            return status
+        return "not yet scheduled"
+
     @staticmethod
     def process_entry_time(x):
         if "published_parsed" in x:
@@ -180,81 +499,76 @@ class RSS(commands.Cog):
     async def find_feeds(self, site: str) -> List[str]:
         """
         Attempts to find feeds on a page
+
+        Results are cached for an hour.
         """
 
+        if (cached := self._discovery_cache.get(site)) is not None:
+            return cached
+
         async with self.session.get(site) as response:
             data = await response.read()
 
-        possible_feeds = set()
-        html = bs4(data)
-        feed_urls = html.findAll("link", rel="alternate")
-        if len(feed_urls) > 1:
-            for f in feed_urls:
-                if t := f.get("type", None):
-                    if "rss" in t or "xml" in t:
-                        if href := f.get("href", None):
-                            possible_feeds.add(href)
-
-        parsed_url = urllib.parse.urlparse(site)
-        scheme, hostname = parsed_url.scheme, parsed_url.hostname
-        if scheme and hostname:
-            base = "://".join((scheme, hostname))
-            atags = html.findAll("a")
-
-            for a in atags:
-                if href := a.get("href", None):
-                    if "xml" in href or "rss" in href or "feed" in href:
-                        possible_feeds.add(base + href)
-
-        return [site for site in possible_feeds if await self.fetch_feed(site)]
+        possible_feeds = await self.run_in_pool(find_feed_links, data, site)
+        responses = await self.fetch_many(possible_feeds)
+        ret = [url for url in possible_feeds if responses.get(url, None)]
+        self._discovery_cache.set(site, ret)
+        return ret
 
     async def format_and_send(
         self,
         *,
         destination: discord.TextChannel,
-        response: feedparser.FeedParserDict,
+        response: ParsedFeed,
         feed_name: str,
         feed_settings: dict,
         embed_default: bool,
         force: bool = False,
-    ) -> Optional[List[int]]:
+        texts: Optional[List[EntryText]] = None,
+    ) -> Tuple[Optional[List[int]], List[asyncio.Future]]:
         """
-        Formats and sends,
+        Formats and queues sends,
         returns the integer timestamp of latest entry in the feed which was sent
+        along with the futures of the queued sends.
+
+        Forced updates wait for the send, others return once queued.
+
+        Entries are new if their key isn't in the feed's seen keys.
+        Feeds which predate tracking seen keys fall back to comparing times.
+
+        The text of entries used by filters may be provided,
+        to share it between each subscription to a feed.
         """
 
         use_embed = feed_settings.get("embed_override", None)
         if use_embed is None:
             use_embed = embed_default
 
-        assert isinstance(response.entries, list), "mypy"  # nosec
-
-        match_rule = feed_settings.get("match_req", [])
-
-        def meets_rule(entry):
-            if not match_rule:
-                return True
-
-            field_name, term = match_rule
+        entries: List[Dict[str, Any]] = response["entries"]
 
-            d = getattr(entry, field_name, None)
-            if not d:
-                return False
-            elif isinstance(d, list):
-                for item in d:
-                    if term in item:
-                        return True
-                return False
-            elif isinstance(d, str):
-                return term in d.casefold()
-
-            return False
+        if (predicate := compile_filters(feed_settings)) is not None:
+            texts = texts or entry_texts(entries)
+            meets_rule = lambda idx: predicate(texts[idx])  # noqa: E731
+        else:
+            meets_rule = lambda idx: True  # noqa: E731
 
         if force:
-            _to_send = next(filter(meets_rule, response.entries), None)
+            _to_send = next(
+                (e for idx, e in enumerate(entries) if meets_rule(idx)), None
+            )
             if not _to_send:
-                return None
+                return None, []
             to_send = [_to_send]
+        elif (seen := feed_settings.get("seen", None)) is not None:
+            seen_keys = set(seen)
+            to_send = sorted(
+                [
+                    e
+                    for idx, (e, key) in enumerate(zip(entries, response["entry_keys"]))
+                    if key not in seen_keys and meets_rule(idx)
+                ],
+                key=self.process_entry_time,
+            )
         else:
             last = feed_settings.get("last", None)
             last = tuple((last or (0,))[:5])
@@ -262,100 +576,140 @@ class RSS(commands.Cog):
             to_send = sorted(
                 [
                     e
-                    for e in response.entries
-                    if self.process_entry_time(e) > last and meets_rule(e)
+                    for idx, e in enumerate(entries)
+                    if self.process_entry_time(e) > last and meets_rule(idx)
                 ],
                 key=self.process_entry_time,
             )
 
+        if not to_send:
+            return None, []
+
+        template = self.get_template(use_embed, feed_settings.get("template", None))
+        rendered = await self.run_in_pool(render_entries, to_send, template)
+
         last_sent = None
         roles = feed_settings.get("role_mentions", [])
-        for entry in to_send:
+        sends = []
+        for entry, content in zip(to_send, rendered):
             color = destination.guild.me.color
 
             kwargs = self.format_post(
-                entry, use_embed, color, feed_settings.get("template", None), roles
+                entry, use_embed, color, template, roles, rendered=content
             )
-            try:
-                r = discord.http.Route(
-                    "POST", "/channels/{channel_id}/messages", channel_id=destination.id
-                )
-                if em := kwargs.pop("embed", None):
-                    assert isinstance(em, discord.Embed), "mypy"  # nosec
-                    kwargs["embed"] = em.to_dict()
-                kwargs["allowed_mentions"] = {"parse": [], "roles": roles}
-
-                await self.bot.http.request(r, json=kwargs)
-            except discord.HTTPException as exc:
-                debug_exc_log(log, exc, "Exception while sending feed.")
-                self.bot.dispatch(
-                    # If you want to use this, make your listener accept
-                    # what you need from this + **kwargs to not break if I add more
-                    # This listener is versioned.
-                    # you should not mutate the feedparser classes.
-                    #
-                    # version: 1
-                    # destination: discord.TextChannel
-                    # feed_name: str
-                    # feedparser_entry: feedparser.FeedParserDict
-                    # feed_settings: MappingProxy
-                    # forced_update: bool
-                    "sinbadcogs_rss_send_fail",
-                    listener_version=1,
-                    destination=destination,
-                    feed_name=feed_name,
-                    feedparser_entry=entry,
-                    feed_settings=MappingProxyType(feed_settings),
-                    forced_update=force,
-                )
-            else:
-                self.bot.dispatch(
-                    # If you want to use this, make your listener accept
-                    # what you need from this + **kwargs to not break if I add more
-                    # This listener is versioned.
-                    # you should not mutate the feedparser classes.
-                    #
-                    # version: 1
-                    # destination: discord.TextChannel
-                    # feed_name: str
-                    # feedparser_entry: feedparser.FeedParserDict
-                    # feed_settings: MappingProxy
-                    # forced_update: bool
-                    "sinbadcogs_rss_send",
-                    listener_version=1,
-                    destination=destination,
-                    feed_name=feed_name,
-                    feedparser_entry=entry,
-                    feed_settings=MappingProxyType(feed_settings),
-                    forced_update=force,
+            if em := kwargs.pop("embed", None):
+                assert isinstance(em, discord.Embed), "mypy"  # nosec
+                kwargs["embed"] = em.to_dict()
+            kwargs["allowed_mentions"] = {"parse": [], "roles": roles}
+
+            sends.append(
+                self._send_queue.submit(
+                    destination.id,
+                    partial(
+                        self.send_entry,
+                        destination=destination,
+                        payload=kwargs,
+                        entry=entry,
+                        feed_name=feed_name,
+                        feed_settings=feed_settings,
+                        force=force,
+                    ),
                 )
-            finally:
-                last_sent = list(self.process_entry_time(entry))
+            )
+            last_sent = list(self.process_entry_time(entry))
 
-        return last_sent
+        if force:
+            await asyncio.gather(*sends)
+        elif metrics := self._metrics:
+            metrics.entries_queued += len(sends)
 
-    def format_post(self, entry, embed: bool, color, template=None, roles=[]) -> dict:
+        return last_sent, sends
 
-        if template is None:
-            if embed:
-                _template = "[$title]($link)"
-            else:
-                _template = "$title: <$link>"
+    async def send_entry(
+        self,
+        *,
+        destination: discord.TextChannel,
+        payload: dict,
+        entry: Dict[str, Any],
+        feed_name: str,
+        feed_settings: dict,
+        force: bool,
+    ) -> bool:
+        """
+        Sends a formatted entry, this should only be called by the send queue.
+        """
+        try:
+            r = discord.http.Route(
+                "POST", "/channels/{channel_id}/messages", channel_id=destination.id
+            )
+            await self.bot.http.request(r, json=payload)
+        except discord.HTTPException as exc:
+            debug_exc_log(log, exc, "Exception while sending feed.")
+            self.bot.dispatch(
+                # If you want to use this, make your listener accept
+                # what you need from this + **kwargs to not break if I add more
+                # This listener is versioned.
+                # you should not mutate the feedparser classes.
+                #
+                # version: 1
+                # destination: discord.TextChannel
+                # feed_name: str
+                # feedparser_entry: feedparser.FeedParserDict
+                # feed_settings: MappingProxy
+                # forced_update: bool
+                "sinbadcogs_rss_send_fail",
+                listener_version=1,
+                destination=destination,
+                feed_name=feed_name,
+                feedparser_entry=to_feedparser(entry),
+                feed_settings=MappingProxyType(feed_settings),
+                forced_update=force,
+            )
+            return False
         else:
-            _template = template
-
-        template = string.Template(_template)
-
-        data = {k: getattr(entry, k, None) for k in USABLE_FIELDS}
+            self.bot.dispatch(
+                # If you want to use this, make your listener accept
+                # what you need from this + **kwargs to not break if I add more
+                # This listener is versioned.
+                # you should not mutate the feedparser classes.
+                #
+                # version: 1
+                # destination: discord.TextChannel
+                # feed_name: str
+                # feedparser_entry: feedparser.FeedParserDict
+                # feed_settings: MappingProxy
+                # forced_update: bool
+                "sinbadcogs_rss_send",
+                listener_version=1,
+                destination=destination,
+                feed_name=feed_name,
+                feedparser_entry=to_feedparser(entry),
+                feed_settings=MappingProxyType(feed_settings),
+                forced_update=force,
+            )
+            return True
 
-        def maybe_clean(key, val):
-            if isinstance(val, str) and key not in DONT_HTML_SCRUB:
-                return html_to_text(val)
-            return val
+    @staticmethod
+    def get_template(embed: bool, template: Optional[str] = None) -> str:
+        if template is None:
+            return DEFAULT_EMBED_TEMPLATE if embed else DEFAULT_TEMPLATE
+        return template
 
-        escaped_usable_fields = {k: maybe_clean(k, v) for k, v in data.items() if v}
+    def format_post(
+        self,
+        entry,
+        embed: bool,
+        color,
+        template=None,
+        roles=[],
+        *,
+        rendered: Optional[str] = None,
+    ) -> dict:
 
-        content = template.safe_substitute(**escaped_usable_fields)
+        if rendered is None:
+            content = render_entry(entry, self.get_template(embed, template))
+        else:
+            content = rendered
 
         if embed:
             if len(content) > 1980:
@@ -383,55 +737,300 @@ class RSS(commands.Cog):
     async def handle_response_from_loop(
         self,
         *,
-        response: Optional[feedparser.FeedParserDict],
+        response: Optional[ParsedFeed],
         channel: discord.TextChannel,
         feed: dict,
         should_embed: bool,
         feed_name: str,
+        texts: Optional[List[EntryText]] = None,
     ):
         if not response:
             return
+        key = (channel.id, feed_name)
+        if key in self._sending or feed_name in self._pending_updates.get(
+            str(channel.id), {}
+        ):
+            # What was last sent isn't written yet,
+            # the next poll picks up from there instead.
+            return
         try:
-            last = await self.format_and_send(
+            last, sends = await self.format_and_send(
                 feed_name=feed_name,
                 destination=channel,
                 response=response,
                 feed_settings=feed,
                 embed_default=should_embed,
+                texts=texts,
             )
         except Exception as exc:
             debug_exc_log(log, exc)
-        else:
-            if last:
-                await self.config.channel(channel).feeds.set_raw(
-                    feed_name, "last", value=last
-                )
+            return
+
+        updates: Dict[str, Any] = {}
+        if last:
+            updates["last"] = last
+        seen = merge_seen(
+            feed.get("seen", None) or [],
+            response["entry_keys"],
+            partial=response.get("partial", False),
+        )
+        if seen != feed.get("seen", None):
+            updates["seen"] = seen
+        if not updates:
+            return
+        # The url is included so that the update is only applied
+        # if the feed wasn't replaced with another by the time it's written.
+        updates["url"] = feed["url"]
+
+        if not sends:
+            self._pending_updates[str(channel.id)][feed_name] = updates
+            return
+
+        # Entries are only marked as seen once they have been sent,
+        # so that any still queued when the cog unloads are sent after it loads.
+        def record(fut: asyncio.Future):
+            self._sending.discard(key)
+            if fut.cancelled() or any(
+                isinstance(result, asyncio.CancelledError) for result in fut.result()
+            ):
+                return
+            self._pending_updates[str(channel.id)][feed_name] = updates
+
+        self._sending.add(key)
+        asyncio.gather(*sends, return_exceptions=True).add_done_callback(record)
+
+    async def flush_feed_updates(self):
+        """
+        Writes what the poll cycle changed about feeds.
+
+        This is done with one write per channel at the end of a cycle,
+        rather than per feed as responses are handled.
+        The updates are recorded before being applied
+        so that they can be finished at next load if interrupted.
+        """
+        if not self._pending_updates:
+            return
+        pending, self._pending_updates = self._pending_updates, defaultdict(dict)
+        await self.config.pending_feed_updates.set(pending)
+        await self.apply_feed_updates(pending)
+        await self.config.pending_feed_updates.clear()
+
+    async def apply_feed_updates(self, updates: Dict[str, Dict[str, dict]]):
+        for channel_id, feed_updates in updates.items():
+            async with self.config.channel_from_id(int(channel_id)).feeds() as feeds:
+                for feed_name, values in feed_updates.items():
+                    feed = feeds.get(feed_name, None)
+                    if feed and feed.get("url", None) == values.get("url", None):
+                        feed.update(values)
+                self._index.set_channel(int(channel_id), feeds)
+
+    async def fetch_many(
+        self, urls: Iterable[str], *, conditional: bool = False
+    ) -> Dict[str, Optional[ParsedFeed]]:
+        """
+        Fetches feeds concurrently.
+
+        Concurrency is bounded both in total and per host,
+        with the limits being configurable by the bot owner.
+        """
+        total_limit = asyncio.Semaphore(await self.config.max_concurrent_fetches())
+        per_host = await self.config.max_fetches_per_host()
+        host_limits: DefaultDict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(per_host)
+        )
+
+        async def bounded_fetch(url: str):
+            host = urllib.parse.urlparse(url).hostname or ""
+            # host first, so that waiting on a busy host doesn't hold a global slot
+            async with host_limits[host], total_limit:
+                return await self.fetch_feed(url, conditional=conditional)
+
+        urls = list(urls)
+        results = await asyncio.gather(
+            *(bounded_fetch(url) for url in urls), return_exceptions=True
+        )
+
+        ret: Dict[str, Optional[ParsedFeed]] = {}
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                debug_exc_log(log, result, f"Unhandled exception fetching {url}")
+                ret[url] = None
+            elif isinstance(result, BaseException):
+                # Such as cancellation
+                raise result
+            else:
+                ret[url] = result
+        return ret
+
+    async def validate_feeds(
+        self, urls: Iterable[str]
+    ) -> Dict[str, Optional[List[str]]]:
+        """
+        Fetches feeds to check they're valid, getting what to mark as seen for each.
+
+        This is done in batches, keeping only what's needed from each response,
+        so that validating thousands of feeds doesn't hold them all in memory.
+        """
+        urls = list(urls)
+        ret: Dict[str, Optional[List[str]]] = {}
+        for start in range(0, len(urls), IMPORT_BATCH_SIZE):
+            responses = await self.fetch_many(urls[start : start + IMPORT_BATCH_SIZE])
+            for url, response in responses.items():
+                ret[url] = merge_seen([], response["entry_keys"]) if response else None
+        return ret
+
+    async def import_feeds(
+        self, assignments: Mapping[int, List[OPMLFeed]], *, restore_roles: bool
+    ) -> Tuple[int, int, List[str]]:
+        """
+        Adds feeds to channels by channel id, after validating them all at once.
+
+        Each channel's feeds are written at once.
+        Feeds with a url the channel already has are skipped,
+        and names already in use in a channel are made unique.
+
+        Returns the number added, the number skipped as duplicates,
+        and the urls which couldn't be validated.
+        """
+        urls = {feed.url for feeds in assignments.values() for feed in feeds}
+        seen = await self.validate_feeds(urls)
+        now = list(datetime.utcnow().timetuple()[:6])
+        added = duplicates = 0
+
+        for channel_id, new_feeds in assignments.items():
+            async with self.config.channel_from_id(channel_id).feeds() as feeds:
+                subscribed = {f.get("url", None) for f in feeds.values()}
+                for feed in new_feeds:
+                    if (feed_seen := seen.get(feed.url, None)) is None:
+                        continue
+                    if feed.url in subscribed:
+                        duplicates += 1
+                        continue
+
+                    name, n = feed.name, 1
+                    while name in feeds:
+                        n += 1
+                        name = f"{feed.name}-{n}"
+
+                    settings = dict(feed.settings)
+                    if not restore_roles:
+                        settings.pop("role_mentions", None)
+                    feeds[name] = {
+                        "url": feed.url,
+                        "template": None,
+                        "embed_override": None,
+                        **settings,
+                        "last": now,
+                        "seen": feed_seen,
+                    }
+                    subscribed.add(feed.url)
+                    added += 1
+                self._index.set_channel(channel_id, feeds)
+
+        return added, duplicates, sorted(u for u, s in seen.items() if s is None)
+
+    async def read_opml_attachment(
+        self, ctx: commands.Context
+    ) -> Optional[List[OPMLFeed]]:
+        """
+        Reads the feeds from an OPML file attached to the command,
+        letting the user know if there's a problem with it.
+        """
+        if not ctx.message.attachments:
+            await ctx.send("You need to attach an OPML file.")
+            return None
+        attachment = ctx.message.attachments[0]
+        if attachment.size > MAX_OPML_SIZE:
+            await ctx.send("That file is too large.")
+            return None
+        try:
+            feeds = await self.run_in_pool(parse_opml, await attachment.read())
+        except ValueError as exc:
+            await ctx.send(str(exc))
+            return None
+        if not feeds:
+            await ctx.send("That file doesn't have any feeds in it.")
+            return None
+        return feeds
+
+    @staticmethod
+    async def send_import_summary(
+        ctx: commands.Context,
+        added: int,
+        duplicates: int,
+        failed: List[str],
+        extra: Optional[str] = None,
+    ):
+        lines = [f"Added {added} feed{'s' if added != 1 else ''}."]
+        if duplicates:
+            lines.append(f"Skipped {duplicates} which were already added.")
+        if extra:
+            lines.append(extra)
+        if failed:
+            lines.append(f"These {len(failed)} didn't seem to be valid rss feeds:")
+            lines.extend(f"<{url}>" for url in failed)
+        for page in pagify("\n".join(lines)):
+            await ctx.send(page)
+
+    async def send_opml_export(
+        self, ctx: commands.Context, title: str, channel_data: Mapping[int, dict]
+    ):
+        channels = []
+        for channel_id, data in channel_data.items():
+            if not (feeds := data.get("feeds", None)):
+                continue
+            channel = self.bot.get_channel(channel_id)
+            name = f"#{channel.name}" if channel else str(channel_id)
+            channels.append((channel_id, name, feeds))
+
+        if not channels:
+            return await ctx.send("There aren't any feeds to export.")
+
+        opml = await self.run_in_pool(build_opml, title, channels)
+        await ctx.send(file=discord.File(io.BytesIO(opml), filename="rss.opml"))
 
     async def do_feeds(self):
-        feeds_fetched: Dict[str, Any] = {}
+        """
+        Polls the feeds which are due to be polled.
+        """
+        if (m := self._metrics) and time.time() - m.started >= METRICS_WINDOW:
+            await self.finish_metrics_window()
+
+        self._poller.sync(self._index.urls())
+        due = self._poller.pop_due()
+        if not due:
+            return
+
+        if (metrics := self._metrics) is None:
+            metrics = self._metrics = PollMetrics()
+        metrics.feeds_due += len(due)
+        started = time.perf_counter()
+        try:
+            await self._do_feeds(due)
+        finally:
+            metrics.record_poll(time.perf_counter() - started)
+
+    async def _do_feeds(self, due: List[str]):
         default_embed_settings: Dict[discord.Guild, bool] = {}
 
-        channel_data = await self.config.all_channels()
-        for channel_id, data in channel_data.items():
+        responses = await self.fetch_many(due, conditional=True)
 
-            channel = self.bot.get_channel(channel_id)
-            if not channel:
+        for url in due:
+            response = responses.get(url, None)
+            if not response:
                 continue
-            if channel.guild not in default_embed_settings:
-                should_embed = await self.should_embed(channel)
-                default_embed_settings[channel.guild] = should_embed
-            else:
-                should_embed = default_embed_settings[channel.guild]
+            # Each subscription's filters are run over the same text
+            texts = entry_texts(response["entries"])
+            for channel_id, feed_name, feed in self._index.subscriptions(url):
 
-            for feed_name, feed in data["feeds"].items():
-                url = feed.get("url", None)
-                if not url:
+                channel = self.bot.get_channel(channel_id)
+                if not channel:
                     continue
-                if url in feeds_fetched:
-                    response = feeds_fetched[url]
+                if channel.guild not in default_embed_settings:
+                    should_embed = await self.should_embed(channel)
+                    default_embed_settings[channel.guild] = should_embed
                 else:
-                    response = await self.fetch_feed(url)
-                    feeds_fetched[url] = response
+                    should_embed = default_embed_settings[channel.guild]
 
                 await self.handle_response_from_loop(
                     response=response,
@@ -439,15 +1038,302 @@ class RSS(commands.Cog):
                     feed=feed,
                     feed_name=feed_name,
                     should_embed=should_embed,
+                    texts=texts,
                 )
 
+        await self.flush_feed_updates()
+        await self.save_validators(self._index.urls())
+        await self.save_failures()
+
+    async def finish_metrics_window(self) -> Optional[PollMetrics]:
+        """
+        Ends the current window of metrics, if any, and writes out the history.
+        """
+        if (metrics := self._metrics) is None:
+            return None
+        self._metrics = None
+        metrics.finish()
+        self._metrics_history.append(metrics)
+        await self.write_metrics_dump()
+        return metrics
+
+    async def write_metrics_dump(self):
+        path = cog_data_path(self) / "metrics.json"
+        windows = [m.to_dict() for m in self._metrics_history]
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, write_dump, path, windows
+            )
+        except OSError as exc:
+            debug_exc_log(log, exc, "Couldn't write metrics.")
+
+    async def load_state(self):
+        """
+        Loads what the poll loop needs from config.
+        """
+        if interrupted := await self.config.pending_feed_updates():
+            await self.apply_feed_updates(interrupted)
+            await self.config.pending_feed_updates.clear()
+        self._index.load(await self.config.all_channels())
+        self._saved_failures = await self.config.feed_failures()
+        self._poller.restore_failures(self._saved_failures)
+        self._streaming_parse = await self.config.streaming_parse()
+        self._max_body_size = await self.config.max_body_size()
+        await self.refresh_session()
+        stored_validators = await self.config.http_validators()
+        # anything fetched while waiting is newer than what was stored.
+        self._http_validators = {**stored_validators, **self._http_validators}
+        self.set_executor(
+            await self.config.parser_executor(), await self.config.parser_workers()
+        )
+
     async def bg_loop(self):
         await self.bot.wait_until_ready()
-        while await asyncio.sleep(300, True):
+        await self.load_state()
+        while True:
             await self.do_feeds()
+            # Wake at least once a minute to pick up new feeds
+            wait = self._poller.time_until_next()
+            await asyncio.sleep(60 if wait is None else min(max(wait, POLL_TICK), 60))
 
     # commands go here
 
+    @checks.is_owner()
+    @commands.group(name="rssset")
+    async def rss_set(self, ctx: commands.Context):
+        """
+        Owner settings for rss
+        """
+        pass
+
+    @rss_set.command(name="concurrency")
+    async def rss_set_concurrency(
+        self, ctx: commands.Context, total: int, per_host: int = 4
+    ):
+        """
+        Sets how many feeds may be fetched at once.
+
+        The first number is the limit across all feeds,
+        the second is the limit for any single host.
+        """
+
+        if total < 1 or per_host < 1:
+            raise commands.BadArgument("Limits must be at least 1.")
+
+        await self.config.max_concurrent_fetches.set(total)
+        await self.config.max_fetches_per_host.set(per_host)
+        await self.refresh_session()
+        await ctx.tick()
+
+    @rss_set.command(name="keepalive")
+    async def rss_set_keepalive(self, ctx: commands.Context, seconds: int):
+        """
+        Sets how long idle connections to feed hosts are kept open for reuse.
+
+        Use 0 to close connections after each fetch.
+        """
+        if seconds < 0:
+            raise commands.BadArgument("This can't be negative.")
+        await self.config.keepalive_timeout.set(seconds)
+        await self.refresh_session()
+        await ctx.tick()
+
+    @rss_set.command(name="dnscache")
+    async def rss_set_dns_cache(self, ctx: commands.Context, seconds: int):
+        """
+        Sets how long DNS lookups for feed hosts are cached.
+
+        Use 0 to disable caching.
+        """
+        if seconds < 0:
+            raise commands.BadArgument("This can't be negative.")
+        await self.config.dns_cache_ttl.set(seconds)
+        await self.refresh_session()
+        await ctx.tick()
+
+    @rss_set.command(name="compression")
+    async def rss_set_compression(self, ctx: commands.Context, enabled: bool):
+        """
+        Sets if feed hosts are asked to compress responses.
+        """
+        await self.config.http_compression.set(enabled)
+        await self.refresh_session()
+        await ctx.tick()
+
+    @rss_set.command(name="parser")
+    async def rss_set_parser(
+        self, ctx: commands.Context, kind: str, workers: Optional[int] = None
+    ):
+        """
+        Sets where feeds are parsed and formatted.
+
+        This may be one of the following:
+            "thread" to use a pool of threads (default)
+            "process" to use a pool of processes
+
+        Processes avoid large feeds slowing down the rest of the bot,
+        but use more memory.
+        If the number of workers isn't provided, a default based on your cpu is used.
+        """
+
+        if (kind := kind.casefold()) not in ("thread", "process"):
+            raise commands.BadArgument("kind must be one of `thread` or `process`")
+
+        if workers is not None and workers < 1:
+            raise commands.BadArgument("There must be at least 1 worker.")
+
+        await self.config.parser_executor.set(kind)
+        await self.config.parser_workers.set(workers)
+        self.set_executor(kind, workers)
+        await ctx.tick()
+
+    @rss_set.command(name="streaming")
+    async def rss_set_streaming(self, ctx: commands.Context, enabled: bool):
+        """
+        Sets if feeds are read incrementally.
+
+        When enabled, reading a feed stops once it only has entries older
+        than those already seen, and feeds over the maximum size
+        are cut short instead of being skipped.
+
+        This assumes feeds list newer entries first.
+        """
+        await self.config.streaming_parse.set(enabled)
+        self._streaming_parse = enabled
+        await ctx.tick()
+
+    @rss_set.command(name="maxsize")
+    async def rss_set_max_size(self, ctx: commands.Context, kilobytes: int):
+        """
+        Sets the maximum size of feed to read, in kilobytes.
+        """
+        if kilobytes < 1:
+            raise commands.BadArgument("The maximum size must be at least 1 kilobyte.")
+        await self.config.max_body_size.set(kilobytes * 1024)
+        self._max_body_size = kilobytes * 1024
+        await ctx.tick()
+
+    @rss_set.command(name="stats")
+    async def rss_set_stats(self, ctx: commands.Context):
+        """
+        Shows how polling feeds has gone recently.
+
+        Metrics are collected over 5 minute windows.
+        The last hour of them are also written to metrics.json
+        in this cog's data folder as each window ends.
+        """
+
+        if self._metrics_history:
+            m = self._metrics_history[-1]
+        elif self._metrics:
+            m = self._metrics
+        else:
+            return await ctx.send("No feeds have been polled yet.")
+
+        ratio = m.unmodified_ratio
+        started = datetime.utcfromtimestamp(m.started).strftime("%H:%M UTC")
+        lines = [
+            f"{m.polls} polls of {m.feeds_due} feeds due in the window from {started}.",
+            f"Polling took {m.poll_seconds:.2f}s in total, "
+            f"the longest poll took {m.longest_poll:.2f}s.",
+            f"Fetched: {m.fetched}, "
+            f"unmodified: {m.unmodified} ({(ratio or 0) * 100:.0f}%), "
+            f"failed: {m.failures}",
+            f"Downloaded: {m.bytes_downloaded / 1024:.1f} KiB, "
+            f"parsing took: {m.parse_seconds:.2f}s",
+            f"Entries queued to send: {m.entries_queued}",
+        ]
+        if m.slowest:
+            lines.append("\nSlowest feeds:")
+            lines.extend(
+                f"{latency:.2f}s {url}"
+                for latency, url in sorted(m.slowest, reverse=True)
+            )
+        if m.host_latency:
+            lines.append("\nSlowest hosts (mean, p99 at most, count):")
+            hosts = sorted(
+                m.host_latency.items(),
+                key=lambda kv: kv[1].total / kv[1].count,
+                reverse=True,
+            )
+            for host, h in hosts[:10]:
+                p99 = h.quantile(0.99)
+                p99_text = f"{p99}s" if p99 is not None else "over 15s"
+                lines.append(f"{h.total / h.count:.2f}s, {p99_text}, {h.count} {host}")
+        windows = [w for w in self._metrics_history if w.duration]
+        if len(windows) > 1:
+            busy = sum(w.poll_seconds for w in windows)
+            elapsed = sum(w.duration or 0 for w in windows)
+            lines.append(
+                f"\nOver the last {len(windows)} windows: "
+                f"polling {busy / elapsed * 100:.0f}% of the time, "
+                f"longest poll {max(w.longest_poll for w in windows):.2f}s"
+            )
+
+        for page in pagify("\n".join(lines)):
+            await ctx.send(box(page))
+
+    @rss_set.command(name="export")
+    async def rss_set_export(self, ctx: commands.Context):
+        """
+        Exports every feed in every channel as an OPML file.
+
+        This can be restored with `[p]rssset import`.
+        """
+        async with ctx.typing():
+            await self.send_opml_export(
+                ctx, "RSS feeds", await self.config.all_channels()
+            )
+
+    @rss_set.command(name="import")
+    async def rss_set_import(self, ctx: commands.Context):
+        """
+        Restores feeds from an attached OPML file made by `[p]rssset export`.
+
+        Feeds are added back to the channels they were exported from,
+        along with their settings.
+        Feeds which can't be fetched are skipped,
+        as are feeds for channels which can't be found.
+        """
+        if (feeds := await self.read_opml_attachment(ctx)) is None:
+            return
+
+        assignments: DefaultDict[int, List[OPMLFeed]] = defaultdict(list)
+        missing = 0
+        for feed in feeds:
+            if feed.channel_id is not None and self.bot.get_channel(feed.channel_id):
+                assignments[feed.channel_id].append(feed)
+            else:
+                missing += 1
+
+        await ctx.send(f"Checking {len(feeds) - missing} feeds, this may take a while.")
+        async with ctx.typing():
+            added, duplicates, failed = await self.import_feeds(
+                assignments, restore_roles=True
+            )
+        extra = f"Skipped {missing} without a channel I can see." if missing else None
+        await self.send_import_summary(ctx, added, duplicates, failed, extra)
+
+    @rss_set.command(name="queues")
+    async def rss_set_queues(self, ctx: commands.Context):
+        """
+        Shows the channels with the most feed updates waiting to be sent.
+        """
+
+        depths = sorted(
+            self._send_queue.depths().items(), key=lambda kv: kv[1], reverse=True
+        )
+        if not depths:
+            return await ctx.send("Nothing is waiting to be sent.")
+
+        output = "\n".join(
+            f"{channel_id}: {depth}" for channel_id, depth in depths[:25]
+        )
+        total = sum(depth for _channel_id, depth in depths)
+        await ctx.send(
+            box(f"{total} waiting across {len(depths)} channels\n\n{output}")
+        )
+
     @checks.mod_or_permissions(manage_channels=True)
     @commands.guild_only()
     @commands.group()
@@ -457,6 +1343,48 @@ class RSS(commands.Cog):
         """
         pass
 
+    @commands.cooldown(1, 300, commands.BucketType.guild)
+    @rss.command(name="import")
+    async def rss_import(
+        self, ctx: commands.GuildContext, channel: Optional[discord.TextChannel] = None
+    ):
+        """
+        Adds every feed in an attached OPML file to the current, or a provided channel.
+
+        Feeds which can't be fetched are skipped.
+        Only the bot owner can import more than 50 feeds at once.
+        """
+        channel = channel or ctx.channel
+        if (feeds := await self.read_opml_attachment(ctx)) is None:
+            return
+
+        if len(feeds) > MAX_IMPORT_FEEDS and not await ctx.bot.is_owner(ctx.author):
+            return await ctx.send(
+                f"That file has {len(feeds)} feeds, "
+                f"only the bot owner can import more than {MAX_IMPORT_FEEDS} at once."
+            )
+
+        await ctx.send(f"Checking {len(feeds)} feeds, this may take a while.")
+        async with ctx.typing():
+            added, duplicates, failed = await self.import_feeds(
+                {channel.id: feeds}, restore_roles=False
+            )
+        await self.send_import_summary(ctx, added, duplicates, failed)
+
+    @rss.command(name="export")
+    async def rss_export(self, ctx: commands.GuildContext):
+        """
+        Exports the feeds of every channel in this server as an OPML file.
+        """
+        channel_ids = {c.id for c in ctx.guild.text_channels}
+        all_channels = await self.config.all_channels()
+        async with ctx.typing():
+            await self.send_opml_export(
+                ctx,
+                f"RSS feeds for {ctx.guild.name}",
+                {k: v for k, v in all_channels.items() if k in channel_ids},
+            )
+
     @commands.cooldown(5, 60, commands.BucketType.guild)
     @rss.command(name="find")
     async def find_feed_command(self, ctx: commands.Context, *, url: str):
@@ -550,9 +1478,11 @@ class RSS(commands.Cog):
                             "template": None,
                             "embed_override": None,
                             "last": list(ctx.message.created_at.timetuple()[:6]),
+                            "seen": merge_seen([], response["entry_keys"]),
                         }
                     }
                 )
+                self._index.set_channel(channel.id, feeds)
 
         await ctx.tick()
 
@@ -573,7 +1503,11 @@ class RSS(commands.Cog):
         if await ctx.embed_requested():
             output = "\n".join(
                 (
-                    "{name}: {url}".format(name=k, url=v.get("url", "broken feed"))
+                    "{name}: {url} ({status})".format(
+                        name=k,
+                        url=v.get("url", "broken feed"),
+                        status=self.poll_status(v.get("url", None)),
+                    )
                     for k, v in data.items()
                 )
             )
@@ -592,7 +1526,11 @@ class RSS(commands.Cog):
         else:
             output = "\n".join(
                 (
-                    "{name}: <{url}>".format(name=k, url=v.get("url", "broken feed"))
+                    "{name}: <{url}> ({status})".format(
+                        name=k,
+                        url=v.get("url", "broken feed"),
+                        status=self.poll_status(v.get("url", None)),
+                    )
                     for k, v in data.items()
                 )
             )
@@ -620,6 +1558,7 @@ class RSS(commands.Cog):
                 return
 
             del feeds[name]
+            self._index.set_channel(channel.id, feeds)
 
         await ctx.tick()
 
@@ -651,6 +1590,7 @@ class RSS(commands.Cog):
                 return
 
             feeds[name]["embed_override"] = setting.state
+            self._index.set_channel(channel.id, feeds)
 
         await ctx.tick()
 
@@ -704,6 +1644,7 @@ class RSS(commands.Cog):
                 return
 
             feeds[name]["template"] = template
+            self._index.set_channel(channel.id, feeds)
 
         await ctx.tick()
 
@@ -721,6 +1662,7 @@ class RSS(commands.Cog):
                 return
 
             del feeds[name]["template"]
+            self._index.set_channel(channel.id, feeds)
 
         await ctx.tick()
 
@@ -752,6 +1694,7 @@ class RSS(commands.Cog):
                 return
 
             feeds[feed_name]["match_req"] = list(field_and_term)
+            self._index.set_channel(channel.id, feeds)
             await ctx.tick()
 
     @rss.command(name="removematchreq")
@@ -773,8 +1716,180 @@ class RSS(commands.Cog):
                 return
 
             feeds[feed_name].pop("match_req", None)
+            self._index.set_channel(channel.id, feeds)
             await ctx.tick()
 
+    @rss.group(name="filter")
+    async def rss_filter(self, ctx: commands.GuildContext):
+        """
+        Filters for which entries of a feed are published.
+
+        Filters are made of rules on a field of an entry.
+        Rules can require that a field contains, or excludes, a term.
+        Matching ignores case.
+
+        These are checked in addition to any matchreq.
+        """
+        pass
+
+    @rss_filter.command(
+        name="add", usage="<feedname> [channel] <field name> <operator> <term>"
+    )
+    async def rss_filter_add(
+        self,
+        ctx: commands.GuildContext,
+        feed_name: str,
+        channel: Optional[discord.TextChannel],
+        field: str,
+        operator: str,
+        *,
+        term: str,
+    ):
+        """
+        Adds a rule to a feed's filter.
+
+        The operator may be one of:
+            contains, excludes
+        """
+
+        channel = channel or ctx.channel
+        field, operator = field.casefold(), operator.casefold()
+
+        try:
+            validate_rule(field, operator, term)
+        except ValueError as exc:
+            raise commands.BadArgument(str(exc))
+
+        async with self.config.channel(channel).feeds() as feeds:
+            if feed_name not in feeds:
+                await ctx.send(f"No feed named {feed_name} in {channel.mention}.")
+                return
+
+            filters = feeds[feed_name].setdefault("filters", {"mode": "all"})
+            rules = filters.setdefault("rules", [])
+            if len(rules) >= MAX_RULES:
+                await ctx.send(f"Feeds can't have more than {MAX_RULES} rules.")
+                return
+            rules.append([field, operator, term])
+            self._index.set_channel(channel.id, feeds)
+
+        await ctx.tick()
+
+    @rss_filter.command(name="mode", usage="<feedname> [channel] <all or any>")
+    async def rss_filter_mode(
+        self,
+        ctx: commands.GuildContext,
+        feed_name: str,
+        channel: Optional[discord.TextChannel],
+        mode: str,
+    ):
+        """
+        Sets if entries must meet all of a feed's rules, or any of them.
+        """
+
+        channel = channel or ctx.channel
+        if (mode := mode.casefold()) not in MODES:
+            raise commands.BadArgument("Mode must be one of `all` or `any`")
+
+        async with self.config.channel(channel).feeds() as feeds:
+            if feed_name not in feeds:
+                await ctx.send(f"No feed named {feed_name} in {channel.mention}.")
+                return
+
+            feeds[feed_name].setdefault("filters", {"rules": []})["mode"] = mode
+            self._index.set_channel(channel.id, feeds)
+
+        await ctx.tick()
+
+    @rss_filter.command(name="list")
+    async def rss_filter_list(
+        self,
+        ctx: commands.GuildContext,
+        feed_name: str,
+        channel: Optional[discord.TextChannel] = None,
+    ):
+        """
+        Lists the rules of a feed's filter.
+        """
+
+        channel = channel or ctx.channel
+        feeds = await self.config.channel(channel).feeds()
+        if feed_name not in feeds:
+            return await ctx.send(f"No feed named {feed_name} in {channel.mention}.")
+
+        feed = feeds[feed_name]
+        filters = feed.get("filters", None) or {}
+        rules = filters.get("rules", [])
+        lines = [f"Entries must meet {filters.get('mode', 'all')} of these rules:"]
+        for idx, (field, operator, term) in enumerate(rules, 1):
+            try:
+                validate_rule(field, operator, term)
+            except ValueError:
+                # Such as rules using regular expressions, which were removed.
+                lines.append(f"{idx}. {field} {operator} {term} (ignored, invalid)")
+            else:
+                lines.append(f"{idx}. {field} {operator} {term}")
+        if match_req := feed.get("match_req", None):
+            lines.append(f"Also required by matchreq: {match_req[0]} {match_req[1]}")
+        if not rules and not match_req:
+            return await ctx.send("That feed isn't filtered.")
+
+        for page in pagify("\n".join(lines)):
+            await ctx.send(box(page))
+
+    @rss_filter.command(name="remove")
+    async def rss_filter_remove(
+        self,
+        ctx: commands.GuildContext,
+        feed_name: str,
+        channel: Optional[discord.TextChannel],
+        number: int,
+    ):
+        """
+        Removes a rule from a feed's filter, by its number in the filter list.
+        """
+
+        channel = channel or ctx.channel
+
+        async with self.config.channel(channel).feeds() as feeds:
+            if feed_name not in feeds:
+                await ctx.send(f"No feed named {feed_name} in {channel.mention}.")
+                return
+
+            rules = (feeds[feed_name].get("filters", None) or {}).get("rules", [])
+            if not 0 < number <= len(rules):
+                await ctx.send("There isn't a rule with that number.")
+                return
+            del rules[number - 1]
+            self._index.set_channel(channel.id, feeds)
+
+        await ctx.tick()
+
+    @rss_filter.command(name="clear")
+    async def rss_filter_clear(
+        self,
+        ctx: commands.GuildContext,
+        feed_name: str,
+        channel: Optional[discord.TextChannel] = None,
+    ):
+        """
+        Removes every rule from a feed's filter.
+
+        This doesn't remove a matchreq.
+        """
+
+        channel = channel or ctx.channel
+
+        async with self.config.channel(channel).feeds() as feeds:
+            if feed_name not in feeds:
+                await ctx.send(f"No feed named {feed_name} in {channel.mention}.")
+                return
+
+            feeds[feed_name].pop("filters", None)
+            self._index.set_channel(channel.id, feeds)
+
+        await ctx.tick()
+
     @checks.admin_or_permissions(manage_guild=True)
     @rss.command(name="rolementions")
     async def feedset_mentions(
@@ -811,6 +1926,7 @@ class RSS(commands.Cog):
                 return
 
             feeds[name]["role_mentions"] = [r.id for r in roles]
+            self._index.set_channel(channel.id, feeds)
 
         if roles:
             await ctx.send("I've set those roles to be mentioned.")
@@ -0,0 +1,168 @@
+#   Copyright 2017-present Michael Hall
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .parsing import USABLE_TEXT_FIELDS
+
+__all__ = [
+    "MAX_RULES",
+    "MODES",
+    "OPERATORS",
+    "EntryText",
+    "compile_filters",
+    "entry_texts",
+    "validate_rule",
+]
+
+"""
+Feed settings may have filters stored as:
+
+    {"mode": "all" or "any", "rules": [[field, operator, term], ...]}
+
+Along with the older single "match_req" of [field, term],
+which is always required in addition to any other rules.
+
+Rules are compiled once per distinct set of rules, rather than per feed,
+so channels with the same filters on a feed share the same predicate.
+
+Regular expressions aren't offered. These are checked on the event loop,
+and a pattern which backtracks badly would stall the whole bot.
+"""
+
+MODES = ("all", "any")
+OPERATORS = ("contains", "excludes")
+MAX_RULES = 10
+
+Rule = Tuple[str, str, str]
+Predicate = Callable[["EntryText"], bool]
+
+
+def _field_text(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        for key in ("value", "term", "name"):
+            if isinstance(text := value.get(key, None), str):
+                return text
+        return ""
+    if isinstance(value, list):
+        return "\n".join(filter(None, map(_field_text, value)))
+    return ""
+
+
+class EntryText:
+    """
+    The text of an entry's fields, worked out the first time it's needed.
+
+    These are shared by every subscription to a feed,
+    so each field of each entry is only converted once per fetch.
+    """
+
+    __slots__ = ("entry", "_raw", "_folded")
+
+    def __init__(self, entry: Mapping[str, Any]):
+        self.entry = entry
+        self._raw: Dict[str, str] = {}
+        self._folded: Dict[str, str] = {}
+
+    def raw(self, field: str) -> str:
+        try:
+            return self._raw[field]
+        except KeyError:
+            text = self._raw[field] = _field_text(self.entry.get(field, None))
+            return text
+
+    def folded(self, field: str) -> str:
+        try:
+            return self._folded[field]
+        except KeyError:
+            text = self._folded[field] = self.raw(field).casefold()
+            return text
+
+
+def entry_texts(entries: Sequence[Mapping[str, Any]]) -> List[EntryText]:
+    return [EntryText(e) for e in entries]
+
+
+def validate_rule(field: str, operator: str, term: str):
+    """
+    Raises ValueError with a user facing reason if a rule isn't usable.
+    """
+    if field not in USABLE_TEXT_FIELDS:
+        raise ValueError(f"Field must be one of: {', '.join(USABLE_TEXT_FIELDS)}")
+    if operator not in OPERATORS:
+        raise ValueError(f"Operator must be one of: {', '.join(OPERATORS)}")
+    if not term:
+        raise ValueError("Must provide a term to match.")
+
+
+def _compile_rule(field: str, operator: str, term: str) -> Predicate:
+    folded_term = term.casefold()
+    if operator == "contains":
+        return lambda t: folded_term in t.folded(field)
+    return lambda t: folded_term not in t.folded(field)
+
+
+def _valid(rule: Rule) -> bool:
+    try:
+        validate_rule(*rule)
+    except ValueError:
+        return False
+    return True
+
+
+@lru_cache(maxsize=1024)
+def _compile(
+    required: Tuple[Rule, ...], mode: str, rules: Tuple[Rule, ...]
+) -> Optional[Predicate]:
+    required_preds = [_compile_rule(*r) for r in required if _valid(r)]
+    preds = [_compile_rule(*r) for r in rules if _valid(r)]
+
+    if preds:
+        if len(preds) == 1:
+            combined = preds[0]
+        elif mode == "any":
+            combined = lambda t: any(p(t) for p in preds)  # noqa: E731
+        else:
+            combined = lambda t: all(p(t) for p in preds)  # noqa: E731
+        required_preds.append(combined)
+
+    if not required_preds:
+        return None
+    if len(required_preds) == 1:
+        return required_preds[0]
+    return lambda t: all(p(t) for p in required_preds)
+
+
+def compile_filters(feed_settings: Mapping[str, Any]) -> Optional[Predicate]:
+    """
+    Gets the predicate entries must meet for a feed, or None if unfiltered.
+
+    Rules which are no longer valid are ignored rather than matching nothing.
+    """
+    required: Tuple[Rule, ...] = ()
+    if match_req := feed_settings.get("match_req", None):
+        field, term = match_req
+        required = ((field, "contains", term),)
+
+    filters = feed_settings.get("filters", None) or {}
+    rules = tuple(tuple(r) for r in filters.get("rules", ()) if len(r) == 3)
+
+    if not (required or rules):
+        return None
+    return _compile(required, filters.get("mode", "all"), rules)
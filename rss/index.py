@@ -0,0 +1,75 @@
+#   Copyright 2017-present Michael Hall
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from __future__ import annotations
+
+import copy
+from typing import Dict, KeysView, List, Mapping, NamedTuple, Tuple
+
+__all__ = ["Subscription", "SubscriptionIndex"]
+
+
+class Subscription(NamedTuple):
+    channel_id: int
+    feed_name: str
+    settings: dict
+
+
+class SubscriptionIndex:
+    """
+    An in memory copy of every channel's feeds, indexed by url.
+
+    This is kept in sync with config by replacing a channel's feeds
+    each time they are modified, so it should never be modified directly.
+    """
+
+    def __init__(self):
+        self._by_channel: Dict[int, Dict[str, dict]] = {}
+        self._by_url: Dict[str, Dict[Tuple[int, str], dict]] = {}
+
+    def load(self, channel_data: Mapping[int, dict]):
+        self._by_channel.clear()
+        self._by_url.clear()
+        for channel_id, data in channel_data.items():
+            self.set_channel(channel_id, data.get("feeds", {}))
+
+    def set_channel(self, channel_id: int, feeds: Mapping[str, dict]):
+        self._remove_channel(channel_id)
+        if not feeds:
+            return
+        copied = copy.deepcopy(dict(feeds))
+        self._by_channel[channel_id] = copied
+        for feed_name, settings in copied.items():
+            if url := settings.get("url", None):
+                self._by_url.setdefault(url, {})[(channel_id, feed_name)] = settings
+
+    def _remove_channel(self, channel_id: int):
+        for feed_name, settings in self._by_channel.pop(channel_id, {}).items():
+            url = settings.get("url", None)
+            if url and (subs := self._by_url.get(url, None)) is not None:
+                subs.pop((channel_id, feed_name), None)
+                if not subs:
+                    del self._by_url[url]
+
+    def urls(self) -> KeysView[str]:
+        return self._by_url.keys()
+
+    def subscriptions(self, url: str) -> List[Subscription]:
+        return [
+            Subscription(channel_id, feed_name, settings)
+            for (channel_id, feed_name), settings in self._by_url.get(url, {}).items()
+        ]
+
+    def __len__(self) -> int:
+        return len(self._by_url)
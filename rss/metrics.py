@@ -0,0 +1,159 @@
+#   Copyright 2017-present Michael Hall
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from __future__ import annotations
+
+import dataclasses
+import heapq
+import json
+import os
+import time
+import urllib.parse
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, DefaultDict, Dict, List, Optional, Tuple
+
+__all__ = ["METRICS_WINDOW", "Histogram", "PollMetrics", "write_dump"]
+
+# Polls are small and frequent, so metrics are collected over this many seconds
+METRICS_WINDOW = 300
+
+# upper bounds, in seconds. Fetches time out at 15.
+LATENCY_BUCKETS: Tuple[float, ...] = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0)
+
+SLOWEST_KEPT = 10
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        # one more count than buckets, for anything over the last bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        The upper bound of the bucket the quantile falls in.
+
+        This is None when there aren't any values,
+        or the quantile is above the largest bound.
+        """
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "buckets": list(self.buckets),
+            "counts": self.counts,
+            "count": self.count,
+            "total": self.total,
+        }
+
+
+@dataclasses.dataclass()
+class PollMetrics:
+    """
+    What happened during the polls made over a window of time.
+    """
+
+    started: float = dataclasses.field(default_factory=time.time)
+    # how long the window was open
+    duration: Optional[float] = None
+    polls: int = 0
+    # time spent polling, in total and for the longest single poll
+    poll_seconds: float = 0.0
+    longest_poll: float = 0.0
+    feeds_due: int = 0
+    fetched: int = 0
+    unmodified: int = 0
+    failures: int = 0
+    bytes_downloaded: int = 0
+    parse_seconds: float = 0.0
+    entries_queued: int = 0
+    host_latency: DefaultDict[str, Histogram] = dataclasses.field(
+        default_factory=lambda: defaultdict(Histogram)
+    )
+    # min heap of (latency, url), holding only the slowest
+    slowest: List[Tuple[float, str]] = dataclasses.field(default_factory=list)
+    _perf_start: float = dataclasses.field(default_factory=time.perf_counter)
+
+    def record_fetch(self, url: str, latency: float):
+        host = urllib.parse.urlparse(url).hostname or ""
+        self.host_latency[host].observe(latency)
+        if len(self.slowest) < SLOWEST_KEPT:
+            heapq.heappush(self.slowest, (latency, url))
+        else:
+            heapq.heappushpop(self.slowest, (latency, url))
+
+    def record_poll(self, seconds: float):
+        self.polls += 1
+        self.poll_seconds += seconds
+        self.longest_poll = max(self.longest_poll, seconds)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._perf_start
+
+    @property
+    def unmodified_ratio(self) -> Optional[float]:
+        responses = self.fetched + self.unmodified
+        return self.unmodified / responses if responses else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "started": self.started,
+            "duration": self.duration,
+            "polls": self.polls,
+            "poll_seconds": self.poll_seconds,
+            "longest_poll": self.longest_poll,
+            "feeds_due": self.feeds_due,
+            "fetched": self.fetched,
+            "unmodified": self.unmodified,
+            "unmodified_ratio": self.unmodified_ratio,
+            "failures": self.failures,
+            "bytes_downloaded": self.bytes_downloaded,
+            "parse_seconds": self.parse_seconds,
+            "entries_queued": self.entries_queued,
+            "host_latency": {h: v.to_dict() for h, v in self.host_latency.items()},
+            "slowest": [
+                {"url": url, "latency": latency}
+                for latency, url in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+
+def write_dump(path: Path, windows: List[Dict[str, Any]]):
+    """
+    Writes metrics for other tools to consume, replacing any prior dump.
+    """
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as fp:
+        json.dump({"version": 2, "windows": windows}, fp, indent=2)
+    os.replace(tmp, path)
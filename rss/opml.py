@@ -0,0 +1,185 @@
+#   Copyright 2017-present Michael Hall
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from __future__ import annotations
+
+import json
+import re
+import xml.etree.ElementTree as ET  # nosec
+from email.utils import formatdate
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from .filters import MAX_RULES, MODES, validate_rule
+
+__all__ = ["OPMLFeed", "build_opml", "parse_opml"]
+
+"""
+These are run in the parsing pool, as files may have thousands of feeds.
+
+Exports group feeds under an outline per channel, and keep the settings
+which aren't specific to a point in time, so they can restore subscriptions.
+Other OPML files are read as a flat list of feeds.
+"""
+
+# Settings kept in exports, the rest are recreated on import.
+EXPORTED_SETTINGS = (
+    "template",
+    "embed_override",
+    "role_mentions",
+    "match_req",
+    "filters",
+)
+
+MAX_NAME_LENGTH = 100
+NAME_RE = re.compile(r"\s+")
+
+
+class OPMLFeed(NamedTuple):
+    name: str
+    url: str
+    channel_id: Optional[int]
+    settings: Dict[str, Any]
+
+
+def _feed_name(outline: ET.Element, url: str) -> str:
+    name = outline.get("text", None) or outline.get("title", None) or url
+    # feed names are used as a single argument to commands
+    return NAME_RE.sub("-", name.strip())[:MAX_NAME_LENGTH]
+
+
+def _valid_rule(rule: Any) -> bool:
+    if not (isinstance(rule, list) and len(rule) == 3):
+        return False
+    if not all(isinstance(part, str) for part in rule):
+        return False
+    try:
+        validate_rule(*rule)
+    except ValueError:
+        return False
+    return True
+
+
+def _clean_setting(key: str, value: Any) -> Any:
+    """
+    The value to keep for a setting, or None if it isn't usable.
+    """
+    if key == "template":
+        return value if isinstance(value, str) and value else None
+    if key == "embed_override":
+        return value if isinstance(value, bool) else None
+    if key == "role_mentions":
+        if not isinstance(value, list):
+            return None
+        roles = [r for r in value if isinstance(r, int) and not isinstance(r, bool)]
+        return roles or None
+    if key == "match_req":
+        if isinstance(value, list) and len(value) == 2:
+            if _valid_rule([value[0], "contains", value[1]]):
+                return value
+        return None
+    if key == "filters":
+        if not isinstance(value, dict) or value.get("mode", "all") not in MODES:
+            return None
+        rules = value.get("rules", None)
+        if not isinstance(rules, list):
+            return None
+        rules = [r for r in rules if _valid_rule(r)][:MAX_RULES]
+        return {"mode": value.get("mode", "all"), "rules": rules} if rules else None
+    return None
+
+
+def _settings(outline: ET.Element) -> Dict[str, Any]:
+    """
+    The settings exported with a feed, dropping any which aren't usable,
+    as they'd otherwise stop the feed from being posted.
+    """
+    try:
+        settings = json.loads(outline.get("settings", None) or "{}")
+    except ValueError:
+        return {}
+    if not isinstance(settings, dict):
+        return {}
+    ret = {}
+    for key, value in settings.items():
+        if key in EXPORTED_SETTINGS:
+            if (cleaned := _clean_setting(key, value)) is not None:
+                ret[key] = cleaned
+    return ret
+
+
+def parse_opml(data: bytes) -> List[OPMLFeed]:
+    """
+    Gets every feed in an OPML file.
+
+    Raises ValueError if this isn't an OPML file.
+    """
+    try:
+        root = ET.fromstring(data)  # nosec
+    except ET.ParseError as exc:
+        raise ValueError(f"That isn't valid XML: {exc}")
+    if root.tag != "opml" or (body := root.find("body")) is None:
+        raise ValueError("That isn't an OPML file.")
+
+    feeds: List[OPMLFeed] = []
+
+    def walk(element: ET.Element, parent_channel_id: Optional[int]):
+        for outline in element.iterfind("outline"):
+            channel_id = parent_channel_id
+            if (cid := outline.get("channelId", None)) and cid.isdigit():
+                channel_id = int(cid)
+            if url := (outline.get("xmlUrl", None) or "").strip():
+                name = _feed_name(outline, url)
+                feeds.append(OPMLFeed(name, url, channel_id, _settings(outline)))
+            walk(outline, channel_id)
+
+    walk(body, None)
+    return feeds
+
+
+def build_opml(
+    title: str, channels: List[Tuple[int, str, Mapping[str, Mapping[str, Any]]]]
+) -> bytes:
+    """
+    Builds an OPML file from (channel id, channel name, feeds) for each channel.
+    """
+    root = ET.Element("opml", version="2.0")
+    head = ET.SubElement(root, "head")
+    ET.SubElement(head, "title").text = title
+    ET.SubElement(head, "dateCreated").text = formatdate(usegmt=True)
+    body = ET.SubElement(root, "body")
+
+    for channel_id, channel_name, feeds in channels:
+        group = ET.SubElement(
+            body,
+            "outline",
+            text=channel_name,
+            title=channel_name,
+            channelId=str(channel_id),
+        )
+        for feed_name, feed in sorted(feeds.items()):
+            if not (url := feed.get("url", None)):
+                continue
+            settings = {
+                k: v
+                for k, v in feed.items()
+                if k in EXPORTED_SETTINGS and v is not None and v != []
+            }
+            attrs = {"type": "rss", "text": feed_name, "title": feed_name}
+            attrs["xmlUrl"] = url
+            if settings:
+                attrs["settings"] = json.dumps(settings, separators=(",", ":"))
+            ET.SubElement(group, "outline", attrs)
+
+    document: bytes = ET.tostring(root, encoding="utf-8", xml_declaration=True)
+    return document
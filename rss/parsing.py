@@ -0,0 +1,193 @@
+#   Copyright 2017-present Michael Hall
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from __future__ import annotations
+
+import functools
+import string
+import time
+import urllib.parse
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+import feedparser
+from bs4 import BeautifulSoup as bs4
+
+from .cleanup import html_to_text
+from .seen import entry_key
+
+"""
+Everything in here is run in a worker (thread or process) rather than the event loop.
+
+Anything passed in or returned may need to cross a process boundary,
+so keep it to module level functions which take and return plain data.
+"""
+
+__all__ = [
+    "DEFAULT_EMBED_TEMPLATE",
+    "DEFAULT_TEMPLATE",
+    "DONT_HTML_SCRUB",
+    "USABLE_FIELDS",
+    "USABLE_TEXT_FIELDS",
+    "compile_template",
+    "find_feed_links",
+    "parse_feed",
+    "render_entries",
+    "render_entry",
+]
+
+DONT_HTML_SCRUB = ["link", "source", "updated", "updated_parsed"]
+
+USABLE_FIELDS = [
+    "author",
+    "author_detail",
+    "description",
+    "comments",
+    "content",
+    "contributors",
+    "created",
+    "updated",
+    "updated_parsed",
+    "link",
+    "name",
+    "published",
+    "published_parsed",
+    "publisher",
+    "publisher_detail",
+    "source",
+    "summary",
+    "summary_detail",
+    "tags",
+    "title",
+    "title_detail",
+]
+
+USABLE_TEXT_FIELDS = [
+    f
+    for f in USABLE_FIELDS
+    if f
+    not in ("published", "published_parsed", "updated", "updated_parsed", "created",)
+]
+
+DEFAULT_EMBED_TEMPLATE = "[$title]($link)"
+DEFAULT_TEMPLATE = "$title: <$link>"
+
+
+def _to_plain(obj: Any) -> Any:
+    if isinstance(obj, time.struct_time):
+        return tuple(obj)
+    if isinstance(obj, dict):
+        return {k: _to_plain(v) for k, v in obj.items() if not isinstance(v, Exception)}
+    if isinstance(obj, (list, tuple)):
+        return [_to_plain(v) for v in obj]
+    return obj
+
+
+def _entry_to_plain(entry: feedparser.FeedParserDict) -> Dict[str, Any]:
+    ret: Dict[str, Any] = _to_plain(entry)
+    # feedparser provides some fields as aliases or fallbacks of others,
+    # such as updated falling back to published,
+    # these don't survive conversion to a plain dict without resolving them.
+    for field in USABLE_FIELDS:
+        if field not in ret and (val := entry.get(field, None)) is not None:
+            ret[field] = _to_plain(val)
+    return ret
+
+
+def parse_feed(data: bytes) -> Dict[str, Any]:
+    """
+    Parses feed data, returning only builtin types.
+
+    The result has the keys "bozo", "feed", "entries",
+    and "entry_keys", the last of which is the key for each entry, in order.
+    Times which feedparser would provide as a struct_time are tuples instead.
+    """
+    parsed = feedparser.parse(data)
+    entries = [_entry_to_plain(e) for e in parsed.entries]
+    return {
+        "bozo": bool(parsed.bozo),
+        "feed": _to_plain(parsed.get("feed", {})),
+        "entries": entries,
+        "entry_keys": [entry_key(e) for e in entries],
+    }
+
+
+class CompiledTemplate(NamedTuple):
+    template: string.Template
+    # The usable fields which the template actually references
+    fields: Tuple[str, ...]
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_template(text: str) -> CompiledTemplate:
+    template = string.Template(text)
+    referenced = set()
+    for match in template.pattern.finditer(text):
+        if name := (match.group("named") or match.group("braced")):
+            referenced.add(name)
+    return CompiledTemplate(
+        template, tuple(f for f in USABLE_FIELDS if f in referenced)
+    )
+
+
+def render_entry(entry: Dict[str, Any], template: str) -> str:
+    """
+    Fills in a template for an entry, scrubbing html from the fields used.
+
+    Fields the template doesn't reference are never looked at,
+    which matters with large html fields such as content and summary.
+    """
+
+    def maybe_clean(key, val):
+        if isinstance(val, str) and key not in DONT_HTML_SCRUB:
+            return html_to_text(val)
+        return val
+
+    compiled = compile_template(template)
+    escaped_usable_fields = {}
+    for k in compiled.fields:
+        if v := entry.get(k, None):
+            escaped_usable_fields[k] = maybe_clean(k, v)
+    return compiled.template.safe_substitute(**escaped_usable_fields)
+
+
+def render_entries(entries: List[Dict[str, Any]], template: str) -> List[str]:
+    return [render_entry(entry, template) for entry in entries]
+
+
+def find_feed_links(data: bytes, site: str) -> List[str]:
+    """
+    Finds links on a page which might be feeds.
+    """
+    possible_feeds = set()
+    html = bs4(data)
+    feed_urls = html.findAll("link", rel="alternate")
+    if len(feed_urls) > 1:
+        for f in feed_urls:
+            if t := f.get("type", None):
+                if "rss" in t or "xml" in t:
+                    if href := f.get("href", None):
+                        possible_feeds.add(href)
+
+    parsed_url = urllib.parse.urlparse(site)
+    scheme, hostname = parsed_url.scheme, parsed_url.hostname
+    if scheme and hostname:
+        base = "://".join((scheme, hostname))
+        atags = html.findAll("a")
+
+        for a in atags:
+            if href := a.get("href", None):
+                if "xml" in href or "rss" in href or "feed" in href:
+                    possible_feeds.add(base + href)
+
+    return sorted(possible_feeds)
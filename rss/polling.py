@@ -0,0 +1,318 @@
+#   Copyright 2017-present Michael Hall
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from __future__ import annotations
+
+import calendar
+import dataclasses
+import heapq
+import random
+import re
+import statistics
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+__all__ = ["PollScheduler", "parse_max_age"]
+
+DEFAULT_INTERVAL = 300.0
+MIN_INTERVAL = 120.0
+MAX_INTERVAL = 3600.0
+JITTER = 0.1
+# How much slower to poll each time we find a feed unchanged
+BACKOFF_FACTOR = 1.5
+# Failing feeds wait twice as long after each consecutive failure,
+# and after enough of them are considered down, only being probed
+# until they respond again.
+BREAKER_THRESHOLD = 3
+MAX_FAILURE_BACKOFF = 86400.0
+# Feeds are read in full at least this often, even when reading them
+# only up to the newest entry already seen is allowed.
+FULL_READ_INTERVAL = 21600.0
+
+SY_PERIODS = {
+    "hourly": 3600,
+    "daily": 86400,
+    "weekly": 604800,
+    "monthly": 2592000,
+    "yearly": 31536000,
+}
+
+MAX_AGE_RE = re.compile(r"(?:^|,)\s*max-age\s*=\s*(\d+)", re.I)
+
+
+def parse_max_age(cache_control: Optional[str]) -> Optional[float]:
+    if cache_control and (match := MAX_AGE_RE.search(cache_control)):
+        return float(match.group(1))
+    return None
+
+
+def _entry_timestamp(entry: Dict[str, Any]) -> Optional[float]:
+    parsed = entry.get("published_parsed", None) or entry.get("updated_parsed", None)
+    if parsed:
+        return float(calendar.timegm(tuple(parsed)[:6]))
+    return None
+
+
+def _publisher_hint(feed: Dict[str, Any]) -> Optional[float]:
+    """
+    The longest interval the publisher asks for between polls, if any.
+
+    Each is a minimum, so the longest is the one which respects them all.
+    """
+    hints = []
+
+    try:
+        hints.append(float(feed["ttl"]) * 60)  # minutes
+    except (KeyError, TypeError, ValueError):
+        pass
+
+    if period := SY_PERIODS.get(str(feed.get("sy_updateperiod", "")).strip().lower()):
+        try:
+            frequency = max(int(feed.get("sy_updatefrequency", 1)), 1)
+        except (TypeError, ValueError):
+            frequency = 1
+        hints.append(period / frequency)
+
+    return max(hints) if hints else None
+
+
+@dataclasses.dataclass()
+class FeedPollState:
+    next_poll: float
+    interval: float = DEFAULT_INTERVAL
+    newest_entry: Optional[float] = None
+    # the median time between entries, as observed in the feed
+    update_interval: Optional[float] = None
+    publisher_hint: Optional[float] = None
+    max_age: Optional[float] = None
+    # for feeds without dates, which entries were in the feed when last polled
+    entries_digest: Optional[int] = None
+    # consecutive failures
+    failures: int = 0
+    # when the feed was last read in full, rather than up to the newest entry
+    last_full_read: Optional[float] = None
+
+
+class PollScheduler:
+    """
+    Decides when each feed is next polled.
+
+    Feeds which update often are polled more often,
+    and feeds which don't are backed off to polling hourly,
+    while respecting what the publisher tells us about how often to check.
+
+    Feeds which fail are retried with exponential backoff, up to daily.
+    """
+
+    def __init__(self):
+        self._states: Dict[str, FeedPollState] = {}
+        # (when, url), with stale entries skipped rather than removed
+        self._heap: List[Tuple[float, str]] = []
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._states
+
+    def _push(self, url: str, state: FeedPollState, when: float):
+        state.next_poll = when
+        heapq.heappush(self._heap, (when, url))
+
+    def sync(self, urls: Iterable[str], now: Optional[float] = None):
+        """
+        Sets which urls are polled.
+
+        New urls have their first poll spread out over the default interval
+        so that many feeds being added at once don't all get polled together.
+        """
+        now = time.time() if now is None else now
+        urls = set(urls)
+
+        for url in [u for u in self._states if u not in urls]:
+            del self._states[url]
+
+        for url in urls:
+            if url not in self._states:
+                state = FeedPollState(next_poll=now)
+                self._states[url] = state
+                self._push(url, state, now + random.uniform(0, DEFAULT_INTERVAL))
+
+        if len(self._heap) > 2 * len(self._states) + 64:
+            self._heap = [
+                (s.next_poll, url) for url, s in self._states.items()
+            ]  # drop stale entries
+            heapq.heapify(self._heap)
+
+    def pop_due(self, now: Optional[float] = None) -> List[str]:
+        now = time.time() if now is None else now
+        due: List[str] = []
+        while self._heap and self._heap[0][0] <= now:
+            when, url = heapq.heappop(self._heap)
+            state = self._states.get(url, None)
+            if state is None or state.next_poll != when:
+                continue
+            due.append(url)
+            # Provisional, so that a poll which never reports back isn't lost.
+            # Recording the outcome of the poll replaces this.
+            self._push(url, state, now + state.interval)
+        return due
+
+    def time_until_next(self, now: Optional[float] = None) -> Optional[float]:
+        now = time.time() if now is None else now
+        while self._heap:
+            when, url = self._heap[0]
+            state = self._states.get(url, None)
+            if state is None or state.next_poll != when:
+                heapq.heappop(self._heap)
+                continue
+            return max(when - now, 0.0)
+        return None
+
+    def read_marker(self, url: str, now: Optional[float] = None) -> Optional[float]:
+        """
+        The time of the newest entry, if the feed may be read only up to it.
+
+        This is None when the feed is due to be read in full,
+        so that what's remembered about it is periodically brought up to date.
+        """
+        now = time.time() if now is None else now
+        if (state := self._states.get(url, None)) is None:
+            return None
+        if state.last_full_read is None:
+            return None
+        if now - state.last_full_read >= FULL_READ_INTERVAL:
+            return None
+        return state.newest_entry
+
+    def next_poll(self, url: str) -> Optional[float]:
+        if state := self._states.get(url, None):
+            return state.next_poll
+        return None
+
+    def failures(self, url: str) -> int:
+        if state := self._states.get(url, None):
+            return state.failures
+        return 0
+
+    def circuit_open(self, url: str) -> bool:
+        """
+        Whether a feed has failed enough times in a row to be considered down.
+        """
+        return self.failures(url) >= BREAKER_THRESHOLD
+
+    def failure_snapshot(self) -> Dict[str, Dict[str, float]]:
+        """
+        The state of failing feeds, to be persisted.
+        """
+        return {
+            url: {"failures": state.failures, "retry_at": state.next_poll}
+            for url, state in self._states.items()
+            if state.failures
+        }
+
+    def restore_failures(self, data: Dict[str, Dict[str, float]]):
+        """
+        Restores the state of failing feeds from a prior snapshot.
+
+        This should be done before the first sync,
+        so that the feeds aren't scheduled as new instead.
+        """
+        for url, info in data.items():
+            try:
+                failures = int(info["failures"])
+                retry_at = float(info["retry_at"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            state = FeedPollState(next_poll=retry_at, failures=failures)
+            self._states[url] = state
+            self._push(url, state, retry_at)
+
+    def _reschedule(self, url: str, state: FeedPollState, now: float):
+        floor = max(MIN_INTERVAL, state.publisher_hint or 0, state.max_age or 0,)
+        state.interval = min(max(state.interval, floor), MAX_INTERVAL)
+        jittered = state.interval * random.uniform(1 - JITTER, 1 + JITTER)
+        self._push(url, state, now + jittered)
+
+    def record_response(
+        self,
+        url: str,
+        feed: Dict[str, Any],
+        *,
+        max_age: Optional[float] = None,
+        now: Optional[float] = None,
+    ):
+        """
+        Schedules the next poll after a feed was fetched and parsed.
+        """
+        if (state := self._states.get(url, None)) is None:
+            return
+        now = time.time() if now is None else now
+
+        state.failures = 0
+        state.max_age = max_age
+        if not feed.get("partial", False):
+            state.last_full_read = now
+        state.publisher_hint = _publisher_hint(feed.get("feed", {}))
+
+        times = sorted(
+            filter(None, map(_entry_timestamp, feed.get("entries", []))), reverse=True
+        )[:10]
+        if len(times) > 1:
+            state.update_interval = statistics.median(
+                [a - b for a, b in zip(times, times[1:])]
+            )
+
+        newest = times[0] if times else None
+        if newest is not None:
+            changed = state.newest_entry is None or newest > state.newest_entry
+            state.newest_entry = max(newest, state.newest_entry or newest)
+        elif keys := feed.get("entry_keys", None):
+            # Without dates, any change to which entries are in the feed counts
+            digest = hash(tuple(keys))
+            changed = digest != state.entries_digest
+            state.entries_digest = digest
+        else:
+            changed = False
+
+        if changed and state.update_interval:
+            # Nyquist, more or less.
+            state.interval = state.update_interval / 2
+        elif changed:
+            state.interval = DEFAULT_INTERVAL
+        else:
+            state.interval *= BACKOFF_FACTOR
+
+        self._reschedule(url, state, now)
+
+    def record_unmodified(
+        self, url: str, *, max_age: Optional[float] = None, now: Optional[float] = None
+    ):
+        if (state := self._states.get(url, None)) is None:
+            return
+        now = time.time() if now is None else now
+        state.failures = 0
+        if max_age is not None:
+            state.max_age = max_age
+        state.interval *= BACKOFF_FACTOR
+        self._reschedule(url, state, now)
+
+    def record_failure(self, url: str, *, now: Optional[float] = None):
+        if (state := self._states.get(url, None)) is None:
+            return
+        now = time.time() if now is None else now
+        state.failures += 1
+        # Once it responds again, it's treated like any other feed.
+        state.interval = DEFAULT_INTERVAL
+        delay = min(
+            DEFAULT_INTERVAL * 2 ** min(state.failures - 1, 16), MAX_FAILURE_BACKOFF
+        )
+        self._push(url, state, now + delay * random.uniform(1 - JITTER, 1 + JITTER))
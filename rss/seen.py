@@ -0,0 +1,69 @@
+#   Copyright 2017-present Michael Hall
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Dict, List, Sequence
+
+__all__ = ["SEEN_LIMIT", "entry_key", "merge_seen"]
+
+# How many entry keys are remembered per feed, beyond those currently in it.
+SEEN_LIMIT = 200
+
+
+def entry_key(entry: Dict[str, Any]) -> str:
+    """
+    A short, stable identifier for an entry.
+
+    This prefers the entry's id (guid), then its link,
+    and only then falls back to its content.
+    It's hashed to keep what we store small regardless of what it came from.
+    """
+    ident = entry.get("id", None) or entry.get("link", None)
+    if not ident:
+        ident = "\n".join(
+            str(entry.get(k, None) or "") for k in ("title", "summary", "published")
+        )
+    return hashlib.blake2b(str(ident).encode(), digest_size=8).hexdigest()
+
+
+def merge_seen(
+    previous: Sequence[str], current: Sequence[str], *, partial: bool = False
+) -> List[str]:
+    """
+    Keys for the current entries, then up to SEEN_LIMIT previously seen keys.
+
+    Keys for entries still in the feed are never evicted,
+    otherwise a feed with more entries than the limit would repost old entries.
+
+    If only part of the feed was read, the entries previous keys are for
+    may still be in the rest of the feed, so rather than keeping SEEN_LIMIT,
+    only as many are evicted as it takes to not grow past the previous keys.
+    The oldest are evicted first, which are those beyond the feed's entries
+    as of the last time it was read in full.
+    """
+    ret = list(dict.fromkeys(current))
+    current_set = set(ret)
+    if partial:
+        room = max(len(previous), len(ret) + SEEN_LIMIT) - len(ret)
+    else:
+        room = SEEN_LIMIT
+    for key in previous:
+        if room <= 0:
+            break
+        if key not in current_set:
+            ret.append(key)
+            room -= 1
+    return ret
@@ -0,0 +1,88 @@
+#   Copyright 2017-present Michael Hall
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Tuple
+
+__all__ = ["ChannelSendQueue"]
+
+log = logging.getLogger("red.sinbadcogs.rss")
+
+SendCallable = Callable[[], Awaitable[Any]]
+
+
+class ChannelSendQueue:
+    """
+    Sends to each channel one message at a time, in order,
+    while sending to different channels concurrently.
+
+    Message sends to a channel share a ratelimit bucket,
+    which discord.py already waits on, so one worker per channel
+    keeps a burst of entries in one channel from holding up any other.
+    Workers only exist while their channel has something queued.
+    """
+
+    def __init__(self):
+        self._queues: Dict[int, Deque[Tuple[SendCallable, asyncio.Future]]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+
+    def submit(self, channel_id: int, send: SendCallable) -> asyncio.Future:
+        """
+        Queues a send, returning a future for its result.
+        """
+        fut = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(channel_id, deque()).append((send, fut))
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.create_task(self._work(channel_id))
+        return fut
+
+    async def _work(self, channel_id: int):
+        queue = self._queues[channel_id]
+        try:
+            while queue:
+                send, fut = queue.popleft()
+                if fut.done():
+                    continue
+                try:
+                    result = await send()
+                except asyncio.CancelledError:
+                    fut.cancel()
+                    raise
+                except Exception as exc:
+                    log.exception(
+                        f"Unhandled exception sending to {channel_id}", exc_info=exc
+                    )
+                    fut.set_exception(exc)
+                    fut.exception()  # This has been logged, don't warn about it.
+                else:
+                    fut.set_result(result)
+        finally:
+            del self._workers[channel_id]
+            del self._queues[channel_id]
+            for _send, fut in queue:
+                fut.cancel()
+
+    def depths(self) -> Dict[int, int]:
+        """
+        How many messages are waiting to be sent, by channel id.
+        """
+        return {channel_id: len(q) for channel_id, q in self._queues.items()}
+
+    def cancel_all(self):
+        for task in self._workers.values():
+            task.cancel()
@@ -0,0 +1,144 @@
+#   Copyright 2017-present Michael Hall
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from __future__ import annotations
+
+import re
+from datetime import datetime, timezone
+from email.utils import mktime_tz, parsedate_tz
+from typing import Optional
+
+__all__ = ["EarlyStop"]
+
+"""
+This doesn't parse feeds, it looks for just enough structure in the raw body
+to tell when the rest of a feed only has entries we've already seen.
+
+It's intentionally conservative, when unsure, it keeps reading.
+"""
+
+ROOT_RE = re.compile(rb"<(rss|feed|rdf:RDF)[\s>]")
+ENTRY_START_RE = re.compile(rb"<(item|entry)[\s>]")
+ENTRY_END_RE = re.compile(rb"</(item|entry)\s*>")
+DATE_RE = re.compile(
+    rb"<(pubDate|published|updated|dc:date)>\s*([^<]+?)\s*</\1>", re.IGNORECASE
+)
+
+CLOSING_TAGS = {
+    b"rss": b"</channel></rss>",
+    b"feed": b"</feed>",
+    b"rdf:RDF": b"</rdf:RDF>",
+}
+
+
+def _parse_date(raw: bytes) -> Optional[float]:
+    text = raw.decode("utf-8", "replace").strip()
+    if parsed := parsedate_tz(text):
+        try:
+            return float(mktime_tz(parsed))
+        except (OverflowError, ValueError):
+            return None
+    try:
+        dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class EarlyStop:
+    """
+    Tracks a feed body as it's read,
+    saying when enough consecutive entries are no newer than a marker
+    that the rest of the feed (assumed newest first) can be skipped.
+
+    Parameters
+    ----------
+    marker: Optional[float]
+        The timestamp of the newest entry already seen.
+        Without one, this never stops early.
+    patience: int
+        How many consecutive entries need to be at or before the marker,
+        this allows for feeds which are only mostly in order.
+    """
+
+    def __init__(self, marker: Optional[float], patience: int = 3):
+        self.marker = marker
+        self.patience = patience
+        self._buffer = bytearray()
+        self._scan_pos = 0
+        self._closing: Optional[bytes] = None
+        self._understood = True
+        self._old_in_a_row = 0
+        # the end of the last complete entry, if we know how to close the document
+        self.cut: Optional[int] = None
+        self.stopped = False
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Adds data, returning if the rest of the body isn't needed.
+        """
+        self._buffer.extend(chunk)
+        if self.stopped or not self._understood:
+            return self.stopped
+
+        if self._closing is None:
+            # Only the start of the document will have the root
+            if match := ROOT_RE.search(self._buffer, 0, 4096):
+                self._closing = CLOSING_TAGS[match.group(1)]
+            elif len(self._buffer) >= 4096:
+                self._understood = False
+                return False
+            else:
+                return False
+
+        while start := ENTRY_START_RE.search(self._buffer, self._scan_pos):
+            end = ENTRY_END_RE.search(self._buffer, start.end())
+            if not end:
+                break
+            self._scan_pos = self.cut = end.end()
+
+            if self.marker is None:
+                continue
+
+            date = DATE_RE.search(self._buffer, start.start(), end.start())
+            when = _parse_date(date.group(2)) if date else None
+            if when is not None and when <= self.marker:
+                self._old_in_a_row += 1
+            else:
+                self._old_in_a_row = 0
+
+            if self._old_in_a_row >= self.patience:
+                self.stopped = True
+                break
+
+        return self.stopped
+
+    def body(self, *, truncate: bool = False) -> Optional[bytes]:
+        """
+        The data to parse.
+
+        If stopped early, or asked to truncate, this is the data up to the
+        last complete entry, closed off to remain a well formed document.
+        None is returned if it can't be truncated.
+        """
+        if not (self.stopped or truncate):
+            return bytes(self._buffer)
+        if self.cut is None or self._closing is None:
+            return None
+        return bytes(self._buffer[: self.cut]) + self._closing
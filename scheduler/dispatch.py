@@ -0,0 +1,113 @@
+#   Copyright 2017-present Michael Hall
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Deque, NamedTuple
+
+__all__ = ["DEFAULT_LIMIT", "DispatchStats", "Dispatcher"]
+
+DEFAULT_LIMIT = 5
+# How many of the most recent runs the lag is reported over.
+LAG_SAMPLES = 500
+
+
+class DispatchStats(NamedTuple):
+    limit: int
+    running: int
+    waiting: int
+    samples: int
+    mean_lag: float
+    p95_lag: float
+    max_lag: float
+
+
+class Dispatcher:
+    """
+    Limits how many due tasks run at once.
+
+    Tasks waiting for a slot are queued by guild, and slots are handed
+    to each guild with waiting tasks in turn, so one guild with many tasks
+    due at the same time doesn't hold up every other guild.
+    """
+
+    def __init__(self, limit: int = DEFAULT_LIMIT):
+        self.limit = limit
+        self._running = 0
+        # guild id -> waiting tasks, in the order guilds get their next turn
+        self._waiting: "OrderedDict[int, Deque[asyncio.Future]]" = OrderedDict()
+        # seconds between when tasks were due and when they started
+        self._lags: Deque[float] = deque(maxlen=LAG_SAMPLES)
+
+    def set_limit(self, limit: int):
+        self.limit = limit
+        self._wake()
+
+    def _wake(self):
+        while self._running < self.limit and self._waiting:
+            guild_id, waiters = self._waiting.popitem(last=False)
+            while waiters and waiters[0].done():  # cancelled while waiting
+                waiters.popleft()
+            if not waiters:
+                continue
+            fut = waiters.popleft()
+            if waiters:
+                self._waiting[guild_id] = waiters
+            self._running += 1
+            fut.set_result(None)
+
+    def _release(self):
+        self._running -= 1
+        self._wake()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, guild_id: int, due: float) -> AsyncIterator[None]:
+        """
+        Waits for a slot to run a task from a guild in.
+        """
+        fut = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(guild_id, deque()).append(fut)
+        self._wake()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Given a slot, but cancelled before getting to use it
+                self._release()
+            raise
+
+        self._lags.append(max(time.time() - due, 0))
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> DispatchStats:
+        waiting = sum(
+            1 for waiters in self._waiting.values() for f in waiters if not f.done()
+        )
+        lags = sorted(self._lags)
+        if lags:
+            mean = sum(lags) / len(lags)
+            p95 = lags[min(int(len(lags) * 0.95), len(lags) - 1)]
+            worst = lags[-1]
+        else:
+            mean = p95 = worst = 0.0
+        return DispatchStats(
+            self.limit, self._running, waiting, len(lags), mean, p95, worst
+        )
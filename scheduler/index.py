@@ -0,0 +1,129 @@
+#   Copyright 2017-present Michael Hall
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Mapping, Optional
+
+from .tasks import Task
+
+__all__ = ["TaskIndex"]
+
+
+def _id(value: Any) -> Any:
+    return getattr(value, "id", value)
+
+
+# attribute -> how to get the key a task is indexed under for it
+INDEXED: Dict[str, Callable[[Task], Hashable]] = {
+    "author": lambda t: t.author_id,
+    "channel": lambda t: t.channel_id,
+    "guild": lambda t: t.guild_id,
+    "extern_cog": lambda t: t.extern_cog,
+}
+
+
+class TaskIndex:
+    """
+    The tasks being run, indexed by the attributes they're looked up by.
+
+    Lookups by author, channel, or guild accept either objects or ids.
+    Tasks are returned in the order they were added.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, Task] = {}
+        # attribute -> key -> uid -> task
+        self._indexes: Dict[str, Dict[Hashable, Dict[str, Task]]] = {
+            attr: {} for attr in INDEXED
+        }
+        # uid -> attribute -> key, as indexed
+        self._keys: Dict[str, Dict[str, Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def __iter__(self) -> Iterator[Task]:
+        return iter(list(self._tasks.values()))
+
+    def __contains__(self, task: Task) -> bool:
+        return task.uid in self._tasks
+
+    def add(self, task: Task):
+        self.remove(task)
+        keys = {attr: get_key(task) for attr, get_key in INDEXED.items()}
+        self._tasks[task.uid] = task
+        self._keys[task.uid] = keys
+        for attr, key in keys.items():
+            self._indexes[attr].setdefault(key, {})[task.uid] = task
+
+    def remove(self, task: Task):
+        if self._tasks.pop(task.uid, None) is None:
+            return
+        for attr, key in self._keys.pop(task.uid).items():
+            bucket = self._indexes[attr][key]
+            del bucket[task.uid]
+            if not bucket:
+                del self._indexes[attr][key]
+
+    def get(self, uid: str) -> Optional[Task]:
+        return self._tasks.get(uid, None)
+
+    def find(self, **attrs: Any) -> List[Task]:
+        """
+        Gets the tasks which have all of the provided attributes.
+
+        The smallest matching index is used to find candidates,
+        with any other attributes then checked against those.
+        """
+        if not attrs:
+            return []
+
+        if "uid" in attrs:
+            task = self._tasks.get(attrs["uid"], None)
+            candidates = [task] if task else []
+            return [t for t in candidates if self._matches(t, attrs)]
+
+        indexed = [a for a in attrs if a in INDEXED]
+        if indexed:
+            buckets = [self._indexes[a].get(_id(attrs[a]), {}) for a in indexed]
+            candidates = list(min(buckets, key=len).values())
+        else:
+            candidates = list(self)
+
+        return [t for t in candidates if self._matches(t, attrs)]
+
+    def find_any(self, lax: Mapping[str, Any], strict: Mapping[str, Any]) -> List[Task]:
+        """
+        Gets the tasks which have all of the strict attributes,
+        and any of the lax attributes.
+        """
+        candidates = self.find(**strict) if strict else list(self)
+        if not lax:
+            return candidates
+        return [
+            t
+            for t in candidates
+            if any(self._matches(t, {attr: value}) for attr, value in lax.items())
+        ]
+
+    def _matches(self, task: Task, attrs: Mapping[str, Any]) -> bool:
+        keys = self._keys.get(task.uid, {})
+        for attr, value in attrs.items():
+            if attr in keys:
+                if keys[attr] != _id(value):
+                    return False
+            elif getattr(task, attr, None) != value:
+                return False
+        return True
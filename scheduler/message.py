@@ -17,11 +17,43 @@ from __future__ import annotations
 import asyncio
 import re
 from datetime import datetime
-from typing import List, Union
+from typing import List, NamedTuple, Optional, Tuple, Union
 
 import discord
 
 EVERYONE_REGEX = re.compile(r"@here|@everyone")
+# These match how discord.py finds raw mentions.
+USER_MENTION_REGEX = re.compile(r"<@!?([0-9]+)>")
+CHANNEL_MENTION_REGEX = re.compile(r"<#([0-9]+)>")
+ROLE_MENTION_REGEX = re.compile(r"<@&([0-9]+)>")
+
+
+class MessageTemplate(NamedTuple):
+    """
+    The parts of a message which only depend on its content,
+    so that tasks which run repeatedly only parse their content once.
+
+    Mentions are kept as ids, and are looked up for each message.
+    """
+
+    prefix: str
+    content: str
+    everyone: bool
+    user_ids: Tuple[int, ...]
+    channel_ids: Tuple[int, ...]
+    role_ids: Tuple[int, ...]
+
+    @classmethod
+    def build(cls, prefix: str, command: str) -> MessageTemplate:
+        content = f"{prefix}{command}"
+        return cls(
+            prefix=prefix,
+            content=content,
+            everyone=bool(EVERYONE_REGEX.match(content)),
+            user_ids=tuple(map(int, USER_MENTION_REGEX.findall(content))),
+            channel_ids=tuple(map(int, CHANNEL_MENTION_REGEX.findall(content))),
+            role_ids=tuple(map(int, ROLE_MENTION_REGEX.findall(content))),
+        )
 
 
 async def dummy_awaitable(*args, **kwargs):
@@ -76,14 +108,21 @@ class SchedulerMessage(discord.Message):
     """
 
     def __init__(
-        self, *, content: str, author: discord.Member, channel: discord.TextChannel
+        self,
+        *,
+        content: str,
+        author: discord.Member,
+        channel: discord.TextChannel,
+        template: Optional[MessageTemplate] = None,
     ) -> None:
+        if template is None:
+            template = MessageTemplate.build("", content)
         # auto current time
         self.id = discord.utils.time_snowflake(datetime.utcnow())
         # important properties for even being processed
         self.author = author
         self.channel = channel
-        self.content = content
+        self.content = template.content
         self.guild = channel.guild  # type: ignore
         # this attribute being in almost everything (and needing to be) is a pain
         self._state = self.guild._state  # type: ignore
@@ -95,24 +134,26 @@ class SchedulerMessage(discord.Message):
         # suport for attachments somehow later maybe?
         self.attachments: List[discord.Attachment] = []
         # mentions
-        self.mention_everyone = self.channel.permissions_for(
-            self.author
-        ).mention_everyone and bool(EVERYONE_REGEX.match(self.content))
-        # pylint: disable=E1133
-        # pylint improperly detects the inherited properties here as not being iterable
-        # This should be fixed with typehint support added to upstream lib later
+        self.mention_everyone = (
+            template.everyone
+            and self.channel.permissions_for(self.author).mention_everyone
+        )
+        # Fills in discord.py's cached raw mentions, rather than parsing them again
+        self._cs_raw_mentions = list(template.user_ids)
+        self._cs_raw_channel_mentions = list(template.channel_ids)
+        self._cs_raw_role_mentions = list(template.role_ids)
         self.mentions: List[Union[discord.User, discord.Member]] = list(
-            filter(None, [self.guild.get_member(idx) for idx in self.raw_mentions])
+            filter(None, [self.guild.get_member(idx) for idx in template.user_ids])
         )
         self.channel_mentions: List[discord.TextChannel] = list(
             filter(
                 None,
                 [
                     self.guild.get_channel(idx)  # type: ignore
-                    for idx in self.raw_channel_mentions
+                    for idx in template.channel_ids
                 ],
             )
         )
         self.role_mentions: List[discord.Role] = list(
-            filter(None, [self.guild.get_role(idx) for idx in self.raw_role_mentions])
+            filter(None, [self.guild.get_role(idx) for idx in template.role_ids])
         )
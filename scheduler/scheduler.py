@@ -18,6 +18,7 @@ import asyncio
 import contextlib
 import functools
 import logging
+import time
 import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Literal, Optional
@@ -25,11 +26,17 @@ from typing import Dict, List, Literal, Optional
 import discord
 from redbot.core import checks, commands
 from redbot.core.config import Config
+from redbot.core.data_manager import cog_data_path
+from redbot.core.utils.chat_formatting import box
 from redbot.core.utils.menus import DEFAULT_CONTROLS, menu
 
 from .checks import can_run_command
 from .converters import NonNumeric, Schedule, TempMute
+from .dispatch import DEFAULT_LIMIT, Dispatcher
+from .index import TaskIndex
+from .storage import ConfigStorage, SQLiteStorage, TaskStorage, sqlite_available
 from .tasks import Task
+from .timer import TaskTimer
 
 """
 To anyone that comes to this later to improve it, the number one improvement
@@ -44,6 +51,9 @@ The patching of discord.TextChannel and fake discord.Message objects is *messy*
 
 SUSPICIOUS_COMMANDS = ("restart", "shutdown", "reload")
 
+# Tasks due this soon are started early, waiting the remainder themselves.
+LOOKAHEAD = 1.0
+
 
 class Scheduler(commands.Cog):
     """
@@ -126,18 +136,19 @@ class Scheduler(commands.Cog):
         t = Task(
             uid=uid,
             nicename=f"Task scheduled by another cog: {calling_cog.qualified_name} | {uid}",
-            author=author,
+            author_id=author.id,
             content=command,
-            channel=channel,
+            channel_id=channel.id,
+            guild_id=channel.guild.id,
             initial=initial,
             recur=recur,
             extern_cog=calling_cog.qualified_name,
         )
 
+        await self._storage_ready.wait()
         async with self._iter_lock:
-            async with self.config.channel(channel).tasks(acquire_lock=False) as tsks:
-                tsks.update(t.to_config())
-            self.tasks.append(t)
+            await self._storage.add(t)
+            self._track_task(t)
 
         return uid
 
@@ -179,13 +190,22 @@ class Scheduler(commands.Cog):
             self, identifier=78631113035100160, force_registration=True
         )
         self.config.register_channel(tasks={})  # Serialized Tasks go in here.
+        self.config.register_global(
+            # where tasks are stored, "config" or "sqlite"
+            storage="config",
+            dispatch_limit=DEFAULT_LIMIT,
+        )
         self.log = logging.getLogger("red.sinbadcogs.scheduler")
         self.bg_loop_task: Optional[asyncio.Task] = None
         self.scheduled: Dict[
             str, asyncio.Task
         ] = {}  # Might change this to a list later.
-        self.tasks: List[Task] = []
+        self.tasks = TaskIndex()
+        self._timer = TaskTimer()
+        self._dispatcher = Dispatcher()
         self._iter_lock = asyncio.Lock()
+        self._storage: TaskStorage = ConfigStorage(self.config)
+        self._storage_ready = asyncio.Event()
 
     def init(self):
         self.bg_loop_task = asyncio.create_task(self.bg_loop())
@@ -195,6 +215,10 @@ class Scheduler(commands.Cog):
             self.bg_loop_task.cancel()
         for task in self.scheduled.values():
             task.cancel()
+        self._storage.close()
+
+    async def cog_before_invoke(self, ctx):
+        await self._storage_ready.wait()
 
     async def red_delete_data_for_user(
         self,
@@ -206,68 +230,89 @@ class Scheduler(commands.Cog):
         if loaded_tasks:
             await self._remove_tasks(*loaded_tasks)
 
-        chan_dict = await self.config.all_channels()
-        c = 0
-        for channel_id, channel_data in chan_dict.items():
-            c += 1
-            if not c % 100:
-                await asyncio.sleep(0)
-
-            collected = []
-            if chan_tasks := channel_data.get("tasks"):
-                for task_id, task in chan_tasks.items():
-                    c += 1
-                    if not c % 100:
-                        await asyncio.sleep(0)
-                    if task.get("author", 0) == user_id:
-                        collected.append(task_id)
-
-            if collected:
-                async with self._iter_lock:
-                    async with self.config.channel_from_id(channel_id).tasks() as tsks:
-                        for task_id in collected:
-                            tsks.pop(task_id, None)
+        # Tasks which weren't loaded, such as those in channels we can't see
+        await self._storage_ready.wait()
+        async with self._iter_lock:
+            await self._storage.remove_by_author(user_id)
+
+    async def _make_storage(self, kind: str) -> TaskStorage:
+        if kind == "sqlite":
+            return await SQLiteStorage.open(cog_data_path(self) / "tasks.db")
+        return ConfigStorage(self.config)
+
+    async def _open_storage(self):
+        kind = await self.config.storage()
+        if kind == "sqlite" and not sqlite_available():
+            self.log.error(
+                "Tasks are stored with SQLite, but apsw isn't installed. "
+                "Tasks stored there won't run until it's installed, "
+                "new tasks are stored in config until then. "
+                "(pip install apsw-wheels)"
+            )
+            kind = "config"
+        self._storage = await self._make_storage(kind)
+
+        if kind == "sqlite":
+            # Tasks added while apsw was missing
+            fallback = ConfigStorage(self.config)
+            stranded = await fallback.load()
+            if any(stranded.values()):
+                await self._storage.add_many(stranded)
+                await fallback.clear()
+
+        self._storage_ready.set()
 
     async def _load_tasks(self):
-        chan_dict = await self.config.all_channels()
-        for channel_id, channel_data in chan_dict.items():
+        chan_dict = await self._storage.load()
+        for channel_id, tasks_dict in chan_dict.items():
             channel = self.bot.get_channel(channel_id)
             if (
                 not channel
                 or not channel.permissions_for(channel.guild.me).read_messages
             ):
                 continue
-            tasks_dict = channel_data.get("tasks", {})
-            for t in Task.bulk_from_config(bot=self.bot, **tasks_dict):
-                self.tasks.append(t)
+            for t in Task.bulk_from_config(guild_id=channel.guild.id, **tasks_dict):
+                self._track_task(t)
+
+    def _track_task(self, task: Task):
+        """
+        Adds a task which has been saved to those which are run.
+        """
+        self.tasks.add(task)
+        self._timer.push(task, task.next_run(time.time()))
 
     async def _remove_tasks(self, *tasks: Task):
         async with self._iter_lock:
             for task in tasks:
                 self.tasks.remove(task)
-                await self.config.channel(task.channel).clear_raw("tasks", task.uid)
+                self._timer.discard(task.uid)
+                await self._storage.remove(task)
 
     async def bg_loop(self):
+        await self._open_storage()
+        self._dispatcher.set_limit(await self.config.dispatch_limit())
         await self.bot.wait_until_ready()
         await asyncio.sleep(2)
-        _guilds = [
-            g for g in self.bot.guilds if g.large and not (g.chunked or g.unavailable)
-        ]
-        await self.bot.request_offline_members(*_guilds)
 
         async with self._iter_lock:
             await self._load_tasks()
         while True:
-            sleep_for = await self.schedule_upcoming()
-            await asyncio.sleep(sleep_for)
+            await self.schedule_upcoming()
+            await self._timer.wait()
 
     async def delayed_wrap_and_invoke(self, task: Task, delay: float):
+        due = time.time() + delay
         await asyncio.sleep(delay)
-        task.update_objects(self.bot)
-        chan = task.channel
+        async with self._dispatcher.slot(task.guild_id, due):
+            await self._invoke_task(task)
+
+    async def _invoke_task(self, task: Task):
+        if not (objects := await task.hydrate(self.bot)):
+            return
+        author, chan = objects
         if not chan.permissions_for(chan.guild.me).read_messages:
             return
-        message = await task.get_message(self.bot)
+        message = await task.get_message(self.bot, author, chan)
         context = await self.bot.get_context(message)
         context.assume_yes = True
         if (
@@ -296,69 +341,52 @@ class Scheduler(commands.Cog):
                         await msg_handler(message)
                         break
 
-    async def schedule_upcoming(self) -> int:
-        """
-        Schedules some upcoming things as tasks.
-        """
-
-        async with self._iter_lock:
-            to_pop = []
-            for k, v in self.scheduled.items():
-                if v.done():
-                    to_pop.append(k)
-                    try:
-                        v.result()
-                    except Exception:
-                        self.log.exception("Dead task ", exc_info=True)
+    def start_task(self, task: Task, delay: float):
+        fut = asyncio.create_task(self.delayed_wrap_and_invoke(task, delay))
+        self.scheduled[task.uid] = fut
+        fut.add_done_callback(functools.partial(self._task_done, task.uid))
 
-            for k in to_pop:
-                self.scheduled.pop(k, None)
+    def _task_done(self, uid: str, fut: asyncio.Task):
+        if self.scheduled.get(uid, None) is fut:
+            del self.scheduled[uid]
+        if fut.cancelled():
+            return
+        if exc := fut.exception():
+            self.log.exception("Dead task ", exc_info=exc)
 
-        to_remove: list = []
+    async def schedule_upcoming(self):
+        """
+        Starts the tasks which are due, rescheduling those which recur.
+        """
 
-        for task in self.tasks:
-            delay = task.next_call_delay
-            if delay < 30 and task.uid not in self.scheduled:
-                self.scheduled[task.uid] = asyncio.create_task(
-                    self.delayed_wrap_and_invoke(task, delay)
-                )
-                if not task.recur:
-                    to_remove.append(task)
+        now = time.time()
+        to_remove: List[Task] = []
 
-        await self._remove_tasks(*to_remove)
+        for task, when in self._timer.pop_due(now + LOOKAHEAD):
+            self.start_task(task, max(when - now, 0))
+            if task.recur:
+                # From now, so that missed runs after a stall aren't all made up
+                self._timer.push(task, task.next_run(max(when, now)))
+            else:
+                to_remove.append(task)
 
-        return 15
+        if to_remove:
+            await self._remove_tasks(*to_remove)
 
     async def fetch_task_by_attrs_exact(self, **kwargs) -> List[Task]:
-        def pred(item):
-            try:
-                return kwargs and all(getattr(item, k) == v for k, v in kwargs.items())
-            except AttributeError:
-                return False
-
         async with self._iter_lock:
-            return [t for t in self.tasks if pred(t)]
+            return self.tasks.find(**kwargs)
 
     async def fetch_task_by_attrs_lax(
         self, lax: Optional[dict] = None, strict: Optional[dict] = None
     ) -> List[Task]:
-        def pred(item):
-            try:
-                if strict and not all(getattr(item, k) == v for k, v in strict.items()):
-                    return False
-            except AttributeError:
-                return False
-            if lax:
-                return any(getattr(item, k, None) == v for k, v in lax.items())
-            return True
-
         async with self._iter_lock:
-            return [t for t in self.tasks if pred(t)]
+            return self.tasks.find_any(lax or {}, strict or {})
 
     async def fetch_tasks_by_guild(self, guild: discord.Guild) -> List[Task]:
 
         async with self._iter_lock:
-            return [t for t in self.tasks if t.channel in guild.text_channels]
+            return self.tasks.find(guild=guild)
 
     # Commands go here
 
@@ -418,9 +446,10 @@ class Scheduler(commands.Cog):
         t = Task(
             uid=str(ctx.message.id),
             nicename=event_name.parsed,
-            author=ctx.author,
+            author_id=ctx.author.id,
             content=command,
-            channel=ctx.channel,
+            channel_id=ctx.channel.id,
+            guild_id=ctx.guild.id,
             initial=start,
             recur=recur,
         )
@@ -434,11 +463,8 @@ class Scheduler(commands.Cog):
                 return await ctx.send("You already have an event by that name here.")
 
         async with self._iter_lock:
-            async with self.config.channel(ctx.channel).tasks(
-                acquire_lock=False
-            ) as tsks:
-                tsks.update(t.to_config())
-            self.tasks.append(t)
+            await self._storage.add(t)
+            self._track_task(t)
 
         if quiet:
             return
@@ -449,14 +475,6 @@ class Scheduler(commands.Cog):
             f"or with `{ctx.clean_prefix}unschedule {event_name.parsed}`"
         )
 
-        if recur and t.next_call_delay < 60:
-            ret += (
-                "\nWith the initial start being set so soon, "
-                "you might have missed an initial use being scheduled by the loop. "
-                "You may find the very first expected run of this was missed or otherwise seems late. "
-                "Future runs will be on time."  # fractions of a second in terms of accuracy.
-            )
-
         await ctx.send(ret)
 
     @commands.check(lambda ctx: not ctx.assume_yes)
@@ -502,8 +520,9 @@ class Scheduler(commands.Cog):
         """
 
         if all_channels:
-            tasks = await self.fetch_tasks_by_guild(ctx.guild)
-            tasks = [t for t in tasks if t.author == ctx.author]
+            tasks = await self.fetch_task_by_attrs_exact(
+                author=ctx.author, guild=ctx.guild
+            )
         else:
             tasks = await self.fetch_task_by_attrs_exact(
                 author=ctx.author, channel=ctx.channel
@@ -603,19 +622,17 @@ class Scheduler(commands.Cog):
         t = Task(
             uid=str(ctx.message.id),
             nicename=f"reminder-{ctx.message.id}",
-            author=ctx.author,
+            author_id=ctx.author.id,
             content=f"schedhelpers selfwhisper {command}",
-            channel=ctx.channel,
+            channel_id=ctx.channel.id,
+            guild_id=ctx.guild.id,
             initial=start,
             recur=recur,
         )
 
         async with self._iter_lock:
-            async with self.config.channel(ctx.channel).tasks(
-                acquire_lock=False
-            ) as tsks:
-                tsks.update(t.to_config())
-            self.tasks.append(t)
+            await self._storage.add(t)
+            self._track_task(t)
 
         await ctx.tick()
 
@@ -655,6 +672,78 @@ class Scheduler(commands.Cog):
         await self.red_delete_data_for_user(requester="owner", user_id=user_id)
         await ctx.tick()
 
+    @checks.is_owner()
+    @scheduleradmin.command()
+    async def storage(self, ctx: commands.Context, kind: str):
+        """
+        Sets where tasks are stored.
+
+        This may be one of the following:
+            "config" to store tasks with the bot's other data (default)
+            "sqlite" to store tasks in a dedicated SQLite database
+
+        SQLite only writes the task being changed, rather than every task
+        in the channel, which helps with many tasks.
+        It requires apsw, which can be installed with `[p]pipinstall apsw-wheels`
+
+        Existing tasks are moved to the new storage.
+        """
+        if (kind := kind.casefold()) not in ("config", "sqlite"):
+            raise commands.BadArgument("kind must be one of `config` or `sqlite`")
+
+        if kind == "sqlite" and not sqlite_available():
+            return await ctx.send(
+                "This requires apsw, install it with "
+                f"`{ctx.clean_prefix}pipinstall apsw-wheels` and reload this cog."
+            )
+
+        current = "sqlite" if isinstance(self._storage, SQLiteStorage) else "config"
+        if kind == current:
+            return await ctx.send(f"Tasks are already stored with {kind}.")
+
+        async with ctx.typing(), self._iter_lock:
+            old, new = self._storage, await self._make_storage(kind)
+            await new.add_many(await old.load())
+            await self.config.storage.set(kind)
+            self._storage = new
+            await old.clear()
+            old.close()
+
+        await ctx.send(f"Tasks are now stored with {kind}.")
+
+    @checks.is_owner()
+    @scheduleradmin.command()
+    async def concurrency(self, ctx: commands.Context, limit: int):
+        """
+        Sets how many scheduled tasks may run at the same time.
+
+        Other tasks which are due wait their turn,
+        with each server's waiting tasks taking turns.
+        Default is 5.
+        """
+        if not 1 <= limit <= 50:
+            return await ctx.send("The limit must be between 1 and 50.")
+        await self.config.dispatch_limit.set(limit)
+        self._dispatcher.set_limit(limit)
+        await ctx.tick()
+
+    @checks.is_owner()
+    @scheduleradmin.command()
+    async def dispatchstats(self, ctx: commands.Context):
+        """
+        Shows how long due tasks have been waiting to run.
+        """
+        stats = self._dispatcher.stats()
+        await ctx.send(
+            box(
+                f"Running: {stats.running} / {stats.limit}\n"
+                f"Waiting: {stats.waiting}\n"
+                f"Lag over the last {stats.samples} runs:\n"
+                f"    mean {stats.mean_lag:.2f}s, 95th percentile "
+                f"{stats.p95_lag:.2f}s, max {stats.max_lag:.2f}s"
+            )
+        )
+
     @checks.bot_has_permissions(add_reactions=True, embed_links=True)
     @scheduleradmin.command()
     async def viewall(self, ctx: commands.GuildContext):
@@ -761,9 +850,10 @@ class Scheduler(commands.Cog):
         mute_task = Task(
             uid=f"mute-{ctx.message.id}",
             nicename=f"mute-{ctx.message.id}",
-            author=ctx.author,
+            author_id=ctx.author.id,
             content=f"mute channel {user.id} {reason}",
-            channel=ctx.channel,
+            channel_id=ctx.channel.id,
+            guild_id=ctx.guild.id,
             initial=now,
             recur=None,
         )
@@ -771,23 +861,19 @@ class Scheduler(commands.Cog):
         unmute_task = Task(
             uid=f"unmute-{ctx.message.id}",
             nicename=f"unmute-{ctx.message.id}",
-            author=ctx.author,
+            author_id=ctx.author.id,
             content=f"unmute channel {user.id} Scheduler: Scheduled Unmute",
-            channel=ctx.channel,
+            channel_id=ctx.channel.id,
+            guild_id=ctx.guild.id,
             initial=unmute_time,
             recur=None,
         )
 
         async with self._iter_lock:
-            self.scheduled[mute_task.uid] = asyncio.create_task(
-                self.delayed_wrap_and_invoke(mute_task, 0)
-            )
+            self.start_task(mute_task, 0)
 
-            async with self.config.channel(ctx.channel).tasks(
-                acquire_lock=False
-            ) as tsks:
-                tsks.update(unmute_task.to_config())
-            self.tasks.append(unmute_task)
+            await self._storage.add(unmute_task)
+            self._track_task(unmute_task)
 
     @can_run_command("mute server")
     @tempmute.command(usage="<user> [reason] [args]", aliases=["guild"])
@@ -824,9 +910,10 @@ class Scheduler(commands.Cog):
         mute_task = Task(
             uid=f"mute-{ctx.message.id}",
             nicename=f"mute-{ctx.message.id}",
-            author=ctx.author,
+            author_id=ctx.author.id,
             content=f"mute server {user.id} {reason}",
-            channel=ctx.channel,
+            channel_id=ctx.channel.id,
+            guild_id=ctx.guild.id,
             initial=now,
             recur=None,
         )
@@ -834,20 +921,16 @@ class Scheduler(commands.Cog):
         unmute_task = Task(
             uid=f"unmute-{ctx.message.id}",
             nicename=f"unmute-{ctx.message.id}",
-            author=ctx.author,
+            author_id=ctx.author.id,
             content=f"unmute server {user.id} Scheduler: Scheduled Unmute",
-            channel=ctx.channel,
+            channel_id=ctx.channel.id,
+            guild_id=ctx.guild.id,
             initial=unmute_time,
             recur=None,
         )
 
         async with self._iter_lock:
-            self.scheduled[mute_task.uid] = asyncio.create_task(
-                self.delayed_wrap_and_invoke(mute_task, 0)
-            )
+            self.start_task(mute_task, 0)
 
-            async with self.config.channel(ctx.channel).tasks(
-                acquire_lock=False
-            ) as tsks:
-                tsks.update(unmute_task.to_config())
-            self.tasks.append(unmute_task)
+            await self._storage.add(unmute_task)
+            self._track_task(unmute_task)
@@ -0,0 +1,271 @@
+#   Copyright 2017-present Michael Hall
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from __future__ import annotations
+
+import asyncio
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Callable, Dict, TypeVar
+
+from redbot.core.config import Config
+
+from .tasks import Task
+
+try:
+    from .apsw_wrapper import Connection
+except ImportError:
+    _apsw_available = False
+else:
+    _apsw_available = True
+
+__all__ = ["ConfigStorage", "SQLiteStorage", "TaskStorage", "sqlite_available"]
+
+"""
+Tasks are loaded in the same form regardless of where they're stored:
+
+    {channel_id: {uid: serialized task, ...}, ...}
+
+With the serialized form being what Task.to_config provides.
+"""
+
+StoredTasks = Dict[int, Dict[str, dict]]
+T = TypeVar("T")
+
+
+def sqlite_available() -> bool:
+    return _apsw_available
+
+
+class TaskStorage(ABC):
+    """
+    Where tasks are kept between loads.
+    """
+
+    @abstractmethod
+    async def load(self) -> StoredTasks:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def add(self, task: Task):
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def add_many(self, tasks: StoredTasks):
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def remove(self, task: Task):
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def remove_by_author(self, author_id: int):
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def clear(self):
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+
+class ConfigStorage(TaskStorage):
+    """
+    Stores tasks in config, by channel.
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+
+    async def load(self) -> StoredTasks:
+        chan_dict = await self.config.all_channels()
+        return {
+            channel_id: channel_data.get("tasks", {})
+            for channel_id, channel_data in chan_dict.items()
+        }
+
+    async def add(self, task: Task):
+        async with self.config.channel_from_id(task.channel_id).tasks(
+            acquire_lock=False
+        ) as tsks:
+            tsks.update(task.to_config())
+
+    async def add_many(self, tasks: StoredTasks):
+        for channel_id, channel_tasks in tasks.items():
+            async with self.config.channel_from_id(channel_id).tasks() as tsks:
+                tsks.update(channel_tasks)
+
+    async def remove(self, task: Task):
+        await self.config.channel_from_id(task.channel_id).clear_raw("tasks", task.uid)
+
+    async def remove_by_author(self, author_id: int):
+        chan_dict = await self.config.all_channels()
+        c = 0
+        for channel_id, channel_data in chan_dict.items():
+            c += 1
+            if not c % 100:
+                await asyncio.sleep(0)
+
+            collected = []
+            if chan_tasks := channel_data.get("tasks"):
+                for task_id, task in chan_tasks.items():
+                    c += 1
+                    if not c % 100:
+                        await asyncio.sleep(0)
+                    if task.get("author", 0) == author_id:
+                        collected.append(task_id)
+
+            if collected:
+                async with self.config.channel_from_id(channel_id).tasks(
+                    acquire_lock=False
+                ) as tsks:
+                    for task_id in collected:
+                        tsks.pop(task_id, None)
+
+    async def clear(self):
+        await self.config.clear_all_channels()
+
+
+class SQLiteStorage(TaskStorage):
+    """
+    Stores tasks in a SQLite database, a row per task.
+
+    Unlike config, adding or removing a task only writes that task.
+    Queries are run in the default executor rather than on the event loop,
+    this should be created with open for the same reason.
+    """
+
+    def __init__(self, path: Path):
+        self._connection = Connection(str(path))
+        with self._connection.with_cursor() as cursor:
+            cursor.execute("""PRAGMA journal_mode=wal""")
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tasks (
+                    uid TEXT PRIMARY KEY,
+                    nicename TEXT NOT NULL,
+                    author_id INTEGER NOT NULL,
+                    channel_id INTEGER NOT NULL,
+                    content TEXT NOT NULL,
+                    initial REAL NOT NULL,
+                    recur REAL,
+                    extern_cog TEXT
+                )
+                """
+            )
+            cursor.execute(
+                """CREATE INDEX IF NOT EXISTS tasks_author ON tasks(author_id)"""
+            )
+            cursor.execute(
+                """CREATE INDEX IF NOT EXISTS tasks_channel ON tasks(channel_id)"""
+            )
+
+    @classmethod
+    async def open(cls, path: Path) -> SQLiteStorage:
+        return await cls._run(cls, path)
+
+    @staticmethod
+    def _row(uid: str, data: dict) -> tuple:
+        return (
+            uid,
+            data.get("nicename", uid),
+            data.get("author", 0),
+            data.get("channel", 0),
+            data.get("content", ""),
+            data.get("initial", 0),
+            data.get("recur", None),
+            data.get("extern_cog", None),
+        )
+
+    @staticmethod
+    async def _run(func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def _execute(self, query: str, params: tuple = ()):
+        with self._connection.with_cursor() as cursor:
+            cursor.execute(query, params)
+
+    def _load(self) -> StoredTasks:
+        ret: StoredTasks = {}
+        with self._connection.with_cursor() as cursor:
+            for row in cursor.execute(
+                """
+                SELECT uid, nicename, author_id, channel_id,
+                    content, initial, recur, extern_cog
+                FROM tasks
+                """
+            ):
+                uid, nicename, author_id, channel_id, *rest = row
+                content, initial, recur, extern_cog = rest
+                ret.setdefault(channel_id, {})[uid] = {
+                    "nicename": nicename,
+                    "author": author_id,
+                    "content": content,
+                    "channel": channel_id,
+                    "initial": initial,
+                    "recur": recur,
+                    "extern_cog": extern_cog,
+                }
+        return ret
+
+    async def load(self) -> StoredTasks:
+        return await self._run(self._load)
+
+    def _insert(self, cursor, rows):
+        cursor.executemany(
+            """
+            INSERT OR REPLACE INTO tasks
+                (uid, nicename, author_id, channel_id,
+                content, initial, recur, extern_cog)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+
+    def _add(self, rows):
+        with self._connection.with_cursor() as cursor:
+            self._insert(cursor, rows)
+
+    async def add(self, task: Task):
+        rows = [self._row(uid, data) for uid, data in task.to_config().items()]
+        await self._run(self._add, rows)
+
+    def _add_many(self, tasks: StoredTasks):
+        rows = [
+            self._row(uid, {**data, "channel": channel_id})
+            for channel_id, channel_tasks in tasks.items()
+            for uid, data in channel_tasks.items()
+        ]
+        with self._connection.transaction() as cursor:
+            self._insert(cursor, rows)
+
+    async def add_many(self, tasks: StoredTasks):
+        await self._run(self._add_many, tasks)
+
+    async def remove(self, task: Task):
+        await self._run(
+            self._execute, """DELETE FROM tasks WHERE uid = ?""", (task.uid,)
+        )
+
+    async def remove_by_author(self, author_id: int):
+        await self._run(
+            self._execute, """DELETE FROM tasks WHERE author_id = ?""", (author_id,)
+        )
+
+    async def clear(self):
+        await self._run(self._execute, """DELETE FROM tasks""")
+
+    def close(self):
+        self._connection.close()
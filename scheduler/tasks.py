@@ -14,27 +14,40 @@
 
 from __future__ import annotations
 
+import asyncio
 import contextlib
 from datetime import datetime, timedelta, timezone
-from typing import Optional, cast
+from typing import Optional, Tuple
 
 import attr
 import discord
 from redbot.core.utils.chat_formatting import humanize_timedelta
 
-from .message import SchedulerMessage
+from .message import MessageTemplate, SchedulerMessage
 
 
 @attr.s(auto_attribs=True, slots=True)
 class Task:
+    """
+    A scheduled command.
+
+    The author and channel are kept as ids, and only looked up
+    when the task runs, see ``hydrate``.
+    """
+
     nicename: str
     uid: str
-    author: discord.Member
+    author_id: int
     content: str
-    channel: discord.TextChannel
+    channel_id: int
+    guild_id: int
     initial: datetime
     recur: Optional[timedelta] = None
     extern_cog: Optional[str] = None
+    # The parsed message, reused until the prefix it was built with changes
+    _template: Optional[MessageTemplate] = attr.ib(
+        default=None, init=False, repr=False, eq=False
+    )
 
     def __attrs_post_init__(self):
         if self.initial.tzinfo is None:
@@ -43,12 +56,44 @@ class Task:
     def __hash__(self):
         return hash(self.uid)
 
-    async def get_message(self, bot):
-
-        pfx = (await bot.get_prefix(self.channel))[0]
-        content = f"{pfx}{self.content}"
+    async def hydrate(
+        self, bot
+    ) -> Optional[Tuple[discord.Member, discord.TextChannel]]:
+        """
+        Gets the author and channel, or None if either is gone.
+
+        Members which aren't cached are requested and then cached,
+        as the bot doesn't request every guild's members to load tasks.
+        """
+        guild = bot.get_guild(self.guild_id)
+        if not guild:
+            return None
+        channel = guild.get_channel(self.channel_id)
+        if not isinstance(channel, discord.TextChannel):
+            return None
+        author = guild.get_member(self.author_id)
+        if not author:
+            try:
+                members = await guild.query_members(
+                    user_ids=[self.author_id], cache=True
+                )
+            except asyncio.TimeoutError:
+                return None
+            if not members:
+                return None
+            author = members[0]
+        return author, channel
+
+    async def get_message(
+        self, bot, author: discord.Member, channel: discord.TextChannel
+    ):
+
+        pfx = (await bot.get_prefix(channel))[0]
+        template = self._template
+        if template is None or template.prefix != pfx:
+            template = self._template = MessageTemplate.build(pfx, self.content)
         return SchedulerMessage(
-            content=content, author=self.author, channel=self.channel
+            content=template.content, author=author, channel=channel, template=template
         )
 
     def to_config(self):
@@ -56,9 +101,9 @@ class Task:
         return {
             self.uid: {
                 "nicename": self.nicename,
-                "author": self.author.id,
+                "author": self.author_id,
                 "content": self.content,
-                "channel": self.channel.id,
+                "channel": self.channel_id,
                 "initial": self.initial.timestamp(),
                 "recur": self.recur.total_seconds() if self.recur else None,
                 "extern_cog": self.extern_cog,
@@ -66,7 +111,7 @@ class Task:
         }
 
     @classmethod
-    def bulk_from_config(cls, bot: discord.Client, **entries):
+    def bulk_from_config(cls, guild_id: int, **entries):
 
         for uid, data in entries.items():
             cid = data.pop("channel", 0)
@@ -76,24 +121,30 @@ class Task:
             recur_raw = data.pop("recur", None)
             recur = timedelta(seconds=recur_raw) if recur_raw else None
 
-            channel = cast(Optional[discord.TextChannel], bot.get_channel(cid))
-            if not channel:
-                continue
-
-            author = channel.guild.get_member(aid)
-            if not author:
-                continue
-
             with contextlib.suppress(AttributeError, ValueError):
                 yield cls(
                     initial=initial,
                     recur=recur,
-                    channel=channel,
-                    author=author,
+                    channel_id=cid,
+                    author_id=aid,
+                    guild_id=guild_id,
                     uid=uid,
                     **data,
                 )
 
+    def next_run(self, after: float) -> float:
+        """
+        The timestamp this next runs at, after the provided one.
+
+        Tasks which don't recur only have their initial time,
+        even once it has passed.
+        """
+        initial = self.initial.timestamp()
+        if self.recur and after >= initial:
+            interval = self.recur.total_seconds()
+            return initial + ((after - initial) // interval + 1) * interval
+        return initial
+
     @property
     def next_call_delay(self) -> float:
 
@@ -112,8 +163,8 @@ class Task:
         embed = discord.Embed(color=color, timestamp=next_run_at)
         embed.title = f"Now viewing {index} of {page_count} selected tasks"
         embed.add_field(name="Command", value=f"[p]{self.content}")
-        embed.add_field(name="Channel", value=self.channel.mention)
-        embed.add_field(name="Creator", value=self.author.mention)
+        embed.add_field(name="Channel", value=f"<#{self.channel_id}>")
+        embed.add_field(name="Creator", value=f"<@{self.author_id}>")
         embed.add_field(name="Task ID", value=self.uid)
 
         try:
@@ -152,17 +203,3 @@ class Task:
         embed.set_footer(text=footer)
         embed.description = description
         return embed
-
-    def update_objects(self, bot):
-        """ Updates objects or throws an AttributeError """
-        guild_id = self.author.guild.id
-        author_id = self.author.id
-        channel_id = self.channel.id
-
-        guild = bot.get_guild(guild_id)
-        self.author = guild.get_member(author_id)
-        self.channel = guild.get_channel(channel_id)
-        if not hasattr(self.channel, "id"):
-            raise AttributeError()
-        # Yes, this is slower than an inline `self.channel.id`
-        # It's also not slow anywhere important, and I prefer the clear intent
@@ -0,0 +1,101 @@
+#   Copyright 2017-present Michael Hall
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .tasks import Task
+
+__all__ = ["TaskTimer"]
+
+# Long waits are broken up, so that changes to the system clock are noticed.
+MAX_WAIT = 300.0
+
+
+class TaskTimer:
+    """
+    Orders tasks by when they next run,
+    so that only the soonest of them ever needs to be waited on.
+
+    Removed and rescheduled tasks leave stale entries in the heap,
+    which are skipped when reached rather than searched for.
+    """
+
+    def __init__(self):
+        # (timestamp, uid)
+        self._heap: List[Tuple[float, str]] = []
+        self._next: Dict[str, float] = {}
+        self._tasks: Dict[str, Task] = {}
+        self._changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._next)
+
+    def __contains__(self, uid: str) -> bool:
+        return uid in self._next
+
+    def push(self, task: Task, when: float):
+        """
+        Schedules a task to run at a timestamp, replacing any prior time.
+        """
+        self._tasks[task.uid] = task
+        self._next[task.uid] = when
+        heapq.heappush(self._heap, (when, task.uid))
+        if self._heap[0] == (when, task.uid):
+            # The wait in progress is for something later
+            self._changed.set()
+
+    def discard(self, uid: str):
+        self._tasks.pop(uid, None)
+        self._next.pop(uid, None)
+        if len(self._heap) > 2 * len(self._next) + 64:
+            self._heap = [(when, uid) for uid, when in self._next.items()]
+            heapq.heapify(self._heap)
+
+    def _peek(self) -> Optional[float]:
+        while self._heap:
+            when, uid = self._heap[0]
+            if self._next.get(uid, None) == when:
+                return when
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, until: float) -> List[Tuple[Task, float]]:
+        """
+        Removes and returns tasks due by a timestamp, with when they're due.
+        """
+        due: List[Tuple[Task, float]] = []
+        while (when := self._peek()) is not None and when <= until:
+            _when, uid = heapq.heappop(self._heap)
+            del self._next[uid]
+            due.append((self._tasks.pop(uid), when))
+        return due
+
+    async def wait(self):
+        """
+        Waits until the next task is due,
+        or until a task is scheduled to run sooner than that.
+        """
+        self._changed.clear()
+        timeout = MAX_WAIT
+        if (when := self._peek()) is not None:
+            timeout = min(max(when - time.time(), 0), MAX_WAIT)
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass